@@ -3,20 +3,32 @@ Utilities package
 """
 
 from .logger import setup_logger, main_logger
+from .cache import FileCache
 from .helpers import (
     clean_text,
     extract_inn,
     parse_revenue,
     extract_phone,
     extract_email,
+    PHONE_PATTERN,
+    EMAIL_PATTERN,
     normalize_company_name,
     get_random_user_agent,
     safe_request,
+    RateLimiter,
+    parse_retry_after,
     validate_inn,
-    chunk_list
+    validate_inn_batch,
+    extract_inn_batch,
+    chunk_list,
+    chunk_list_materialized,
+    write_csv,
+    write_csv_rows,
+    iter_frame_rows,
+    write_json
 )
 
-_all_ = [
+__all__ = [
     'setup_logger',
     'main_logger',
     'clean_text',
@@ -24,9 +36,21 @@ _all_ = [
     'parse_revenue',
     'extract_phone',
     'extract_email',
+    'PHONE_PATTERN',
+    'EMAIL_PATTERN',
     'normalize_company_name',
     'get_random_user_agent',
     'safe_request',
+    'RateLimiter',
+    'parse_retry_after',
     'validate_inn',
-    'chunk_list'
+    'validate_inn_batch',
+    'extract_inn_batch',
+    'chunk_list',
+    'chunk_list_materialized',
+    'write_csv',
+    'write_csv_rows',
+    'iter_frame_rows',
+    'write_json',
+    'FileCache'
 ]
@@ -0,0 +1,95 @@
+"""
+Файловый кэш ответов внешних API
+"""
+import hashlib
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import orjson
+
+from .logger import main_logger
+
+class FileCache:
+    """Кэш на диске: одна JSON-запись на ключ вида '<endpoint>:<идентификатор>' с TTL"""
+
+    def __init__(
+        self,
+        cache_dir: str = ".cache",
+        default_ttl: float = 30 * 86400,
+        ttls: Optional[Dict[str, float]] = None,
+        negative_ttl: float = 86400
+    ):
+        """
+        Args:
+            cache_dir: Каталог кэша
+            default_ttl: Время жизни записи по умолчанию (секунды)
+            ttls: Время жизни записей по endpoint
+            negative_ttl: Время жизни отрицательного результата (None)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.negative_ttl = negative_ttl
+        self.logger = main_logger
+
+    def _path(self, key: str) -> Path:
+        """
+        Путь к файлу записи: <cache_dir>/<endpoint>/<md5[:2]>/<md5>.json
+
+        Args:
+            key: Ключ записи
+
+        Returns:
+            Путь к файлу
+        """
+        endpoint, _, ident = key.partition(':')
+        digest = hashlib.md5(ident.encode('utf-8')).hexdigest()
+        return self.cache_dir / endpoint / digest[:2] / f"{digest}.json"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Получение записи из кэша
+
+        Args:
+            key: Ключ записи
+            default: Значение при отсутствии или устаревании записи
+
+        Returns:
+            Сохраненные данные (в том числе None для отрицательного результата) или default
+        """
+        path = self._path(key)
+
+        try:
+            entry = orjson.loads(path.read_bytes())
+        except FileNotFoundError:
+            return default
+        except Exception as e:
+            self.logger.warning(f"Поврежденная запись кэша {key}: {e}")
+            return default
+
+        if time.time() - entry['ts'] > entry['ttl']:
+            return default
+
+        return entry['data']
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Сохранение записи в кэш
+
+        Args:
+            key: Ключ записи
+            value: Данные (None - отрицательный результат с коротким TTL)
+            ttl: Время жизни записи; по умолчанию по endpoint
+        """
+        if ttl is None:
+            endpoint = key.partition(':')[0]
+            ttl = self.negative_ttl if value is None else self.ttls.get(endpoint, self.default_ttl)
+
+        path = self._path(key)
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(orjson.dumps({'ts': time.time(), 'ttl': ttl, 'data': value}))
+        except Exception as e:
+            self.logger.warning(f"Не удалось записать кэш {key}: {e}")
@@ -1,17 +1,23 @@
 """
 Конфигурация проекта для сбора данных о BTL агентствах
 """
-import json
 import os
+from functools import cached_property, lru_cache
 from pathlib import Path
 from typing import Dict, Any, List
 
+import orjson
+
 class Config:
     """Класс для управления конфигурацией проекта"""
     
-    def _init_(self, config_file: str = "config.json"):
+    def __init__(self, config_file: str = "config.json"):
         self.config_file = config_file
-        self._config = self._load_config()
+    
+    @cached_property
+    def _config(self) -> Dict[str, Any]:
+        """Конфигурация, загружаемая при первом обращении"""
+        return self._load_config()
         
     def _load_config(self) -> Dict[str, Any]:
         """Загрузка конфигурации из файла"""
@@ -21,13 +27,11 @@ class Config:
             # Если config.json не существует, используем example
             example_path = Path("config.example.json")
             if example_path.exists():
-                with open(example_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return orjson.loads(example_path.read_bytes())
             else:
                 return self._get_default_config()
         
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return orjson.loads(config_path.read_bytes())
     
     def _get_default_config(self) -> Dict[str, Any]:
         """Конфигурация по умолчанию"""
@@ -98,8 +102,16 @@ class Config:
         """Годы для анализа выручки"""
         return self.filters.get("revenue_years", [2022, 2023, 2024])
 
-# Глобальный экземпляр конфигурации
-config = Config()
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Глобальный экземпляр конфигурации (создается при первом обращении)"""
+    return Config()
+
+def __getattr__(name: str) -> Any:
+    """Ленивое создание глобального экземпляра `config` при импорте"""
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Вспомогательные константы
 SEGMENT_TAGS = {
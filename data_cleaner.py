@@ -2,18 +2,134 @@
 Модуль для очистки и нормализации данных
 """
 import re
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 import pandas as pd
 
-from ..utils import main_logger, clean_text, normalize_company_name, parse_revenue, extract_inn, extract_phone, extract_email
-from config import config, BTL_KEYWORDS
+from ..utils import (
+    main_logger, clean_text, normalize_company_name, parse_revenue, extract_inn, write_csv, write_csv_rows,
+    PHONE_PATTERN, EMAIL_PATTERN
+)
+from config import Config, get_config, BTL_KEYWORDS, SEGMENT_TAGS, OKVED_CODES
+
+# Предкомпилированные регулярные выражения
+_NAME_STRIP_RE = re.compile(r'[^\w\s\-\&\.\(\)\"\']+')
+_WS_RE = re.compile(r'\s+')
+_NON_DIGIT_RE = re.compile(r'[^\d]')
+_OKVED_RE = re.compile(r'\d{2}\.\d{1,2}(?:\.\d{1,2})?')
+_NUMBER_RE = re.compile(r'\d+')
+# Таблица удаления всех ASCII-символов, кроме цифр (для быстрой очистки ИНН)
+_ASCII_NON_DIGITS = str.maketrans('', '', ''.join(chr(code) for code in range(128) if not chr(code).isdigit()))
+# Строки длиннее этого заведомо не являются полем ИНН
+_MAX_INN_LENGTH = 64
+# Ограниченный шаблон URL без вложенных квантификаторов (защита от ReDoS)
+_URL_RE = re.compile(r'^https?://[\w.\-]{1,253}(?::\d{1,5})?(?:[/?#]\S{0,2048})?$', re.IGNORECASE)
+_URL_PREFIXES = ('http://', 'https://')
+_MAX_URL_LENGTH = 2083
+# Верхняя граница длины текстовых полей перед обработкой регулярными выражениями
+_MAX_FIELD_LENGTH = 4096
+
+# Стандартизация названий регионов
+_REGION_MAPPING = {
+    'москва': 'Москва',
+    'moscow': 'Москва',
+    'спб': 'Санкт-Петербург',
+    'санкт-петербург': 'Санкт-Петербург',
+    'питер': 'Санкт-Петербург',
+    'petersburg': 'Санкт-Петербург',
+    'екатеринбург': 'Екатеринбург',
+    'новосибирск': 'Новосибирск',
+    'казань': 'Казань',
+    'нижний новгород': 'Нижний Новгород',
+    'ростов-на-дону': 'Ростов-на-Дону'
+}
+
+# Все ключевые слова BTL в одном шаблоне: описание сканируется за один проход
+_BTL_KEYWORDS_RE = re.compile('|'.join(re.escape(keyword) for keyword in BTL_KEYWORDS), re.IGNORECASE)
+
+# Теги сегментов: точное совпадение проверяется по множеству, иначе поиск подстроки
+# в порядке приоритета (при нескольких тегах в строке побеждает первый в списке)
+_VALID_SEGMENTS = frozenset(SEGMENT_TAGS.values())
+_SEGMENT_PRIORITY = tuple(SEGMENT_TAGS.values())
+
+# Релевантные коды ОКВЭД одним шаблоном (поиск подстроки, как и раньше)
+_RELEVANT_OKVED_RE = re.compile('|'.join(re.escape(code) for code in OKVED_CODES))
+
+# Стандартизация источников: подстроки и каноническое значение в порядке приоритета
+_SOURCE_PATTERNS = (
+    (('rrar', 'alladvertising'), 'rrar_2025'),
+    (('marketing-tech', 'marketing_tech'), 'marketing_tech'),
+    (('fns',), 'fns_open_data'),
+    (('rusprofile',), 'rusprofile'),
+    (('list-org', 'list_org'), 'list_org')
+)
+
+# Телефон или email одним шаблоном, из тех же шаблонов, что extract_phone и extract_email
+_CONTACT_RE = re.compile(f'(?P<phone>{PHONE_PATTERN})|(?P<email>{EMAIL_PATTERN})')
+
+# Поля компании и значения по умолчанию для отсутствующих ключей
+_FIELD_DEFAULTS = {
+    'name': '',
+    'inn': '',
+    'revenue': 0,
+    'revenue_year': 2024,
+    'segment_tag': '',
+    'source': '',
+    'okved_main': '',
+    'employees': 0,
+    'site': '',
+    'description': '',
+    'region': '',
+    'contacts': '',
+    'rating_ref': ''
+}
+
+# Колонки итогового DataFrame и значения по умолчанию для числовых колонок
+_OUTPUT_COLUMNS = [
+    'inn', 'name', 'revenue_year', 'revenue', 'segment_tag', 'source',
+    'okved_main', 'employees', 'site', 'description', 'region', 'contacts', 'rating_ref'
+]
+_NUMERIC_DEFAULTS = {
+    'revenue': 0,
+    'employees': 0,
+    'revenue_year': 2024
+}
+
+@lru_cache(maxsize=65536)
+def _is_relevant(segment: str, okved: str, description: str, name: str) -> bool:
+    """
+    Проверка релевантности по полям компании (результат кэшируется)
+    
+    Args:
+        segment: Тег сегмента
+        okved: Основной ОКВЭД
+        description: Описание компании
+        name: Название компании
+        
+    Returns:
+        True если компания релевантна
+    """
+    # 1. Проверяем сегмент
+    if segment in _VALID_SEGMENTS:
+        return True
+    
+    # 2. Проверяем ОКВЭД
+    if okved and _RELEVANT_OKVED_RE.search(okved):
+        return True
+    
+    # 3. Проверяем описание на ключевые слова
+    if _BTL_KEYWORDS_RE.search(description + ' ' + name):
+        return True
+    
+    return False
 
 class DataCleaner:
     """Класс для очистки и нормализации данных о компаниях"""
     
-    def __init__(self):
+    def __init__(self, cfg: Optional[Config] = None):
         self.logger = main_logger
-        self.min_revenue = config.min_revenue
+        cfg = cfg or get_config()
+        self.min_revenue = cfg.min_revenue
         
     def clean_companies_data(self, companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -25,17 +141,67 @@ class DataCleaner:
         Returns:
             Список очищенных данных компаний
         """
-        cleaned_companies = []
-        
-        self.logger.info(f"Начинаем очистку {len(companies)} компаний")
+        # Пакетная очистка и фильтрация в DataFrame
+        return self.clean_companies_df(companies).to_dict('records')
+    
+    def clean_companies_df(self, companies: List[Dict[str, Any]]) -> pd.DataFrame:
+        """
+        Векторизованная очистка списка компаний
         
-        for company in companies:
-            cleaned_company = self.clean_single_company(company)
-            if cleaned_company:
-                cleaned_companies.append(cleaned_company)
+        Args:
+            companies: Список сырых данных компаний
+            
+        Returns:
+            DataFrame с очищенными данными компаний
+        """
+        columns = list(_FIELD_DEFAULTS)
         
-        self.logger.info(f"Очищено {len(cleaned_companies)} компаний")
-        return cleaned_companies
+        if not companies:
+            return pd.DataFrame(columns=columns)
+        
+        self.logger.info(f"Начинаем векторизованную очистку {len(companies)} компаний")
+        
+        raw = pd.DataFrame(
+            {col: [company.get(col, default) for company in companies] for col, default in _FIELD_DEFAULTS.items()},
+            dtype=object
+        )
+        df = pd.DataFrame(index=raw.index)
+        
+        df['name'] = raw['name'].map(self._clean_company_name)
+        
+        # ИНН: строки длиннее _MAX_INN_LENGTH отбрасываем (как в _clean_inn),
+        # в остальных оставляем только цифры, допустимая длина 10 или 12
+        inn = raw['inn'].where(raw['inn'].astype(bool), '').astype(str).str.strip()
+        inn = inn.where(inn.str.len() <= _MAX_INN_LENGTH, '').str.replace(_NON_DIGIT_RE, '', regex=True)
+        df['inn'] = inn.where(inn.str.len().isin((10, 12)), '')
+        
+        # Выручка: числа приводим напрямую, строки разбираем через parse_revenue
+        revenue = pd.to_numeric(raw['revenue'], errors='coerce')
+        text_mask = revenue.isna()
+        if text_mask.any():
+            revenue[text_mask] = raw.loc[text_mask, 'revenue'].map(self._clean_revenue)
+        df['revenue'] = revenue.astype(float)
+        
+        df['revenue_year'] = raw['revenue_year'].map(self._clean_revenue_year)
+        df['segment_tag'] = raw['segment_tag'].map(self._clean_segment_tag)
+        df['source'] = raw['source'].map(self._clean_source)
+        
+        okved = raw['okved_main'].where(raw['okved_main'].astype(bool), '').astype(str)
+        df['okved_main'] = okved.str.extract(f'({_OKVED_RE.pattern})', expand=False).fillna('')
+        
+        df['employees'] = raw['employees'].map(self._clean_employees)
+        df['site'] = raw['site'].map(self._clean_url)
+        df['description'] = raw['description'].map(self._clean_description)
+        df['region'] = raw['region'].map(self._clean_region)
+        df['contacts'] = raw['contacts'].map(self._clean_contacts)
+        df['rating_ref'] = raw['rating_ref'].map(self._clean_url)
+        
+        # Те же условия, что и в _is_valid_company
+        valid = (df['name'] != '') & ~((df['revenue'] > 0) & (df['revenue'] < self.min_revenue))
+        df = df[valid].reset_index(drop=True)
+        
+        self.logger.info(f"Очищено {len(df)} компаний")
+        return df
     
     def clean_single_company(self, company: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -82,14 +248,15 @@ class DataCleaner:
     
     def _clean_company_name(self, name: str) -> str:
         """Очистка названия компании"""
-        if not name:
+        if not name or not isinstance(name, str):
             return ""
         
-        name = normalize_company_name(name)
+        # Ограничиваем длину до обработки регулярными выражениями
+        name = normalize_company_name(name[:_MAX_FIELD_LENGTH])
         
         # Удаляем лишние символы
-        name = re.sub(r'[^\w\s\-\&\.\(\)\"\']+', ' ', name)
-        name = re.sub(r'\s+', ' ', name).strip()
+        name = _NAME_STRIP_RE.sub(' ', name)
+        name = _WS_RE.sub(' ', name).strip()
         
         return name
     
@@ -100,7 +267,15 @@ class DataCleaner:
         
         # Приводим к строке и оставляем только цифры
         inn_str = str(inn).strip()
-        inn_digits = re.sub(r'[^\d]', '', inn_str)
+        if len(inn_str) > _MAX_INN_LENGTH:
+            return ""
+        
+        if inn_str.isdigit():
+            inn_digits = inn_str
+        elif inn_str.isascii():
+            inn_digits = inn_str.translate(_ASCII_NON_DIGITS)
+        else:
+            inn_digits = _NON_DIGIT_RE.sub('', inn_str)
         
         # Проверяем длину
         if len(inn_digits) in [10, 12]:
@@ -114,7 +289,15 @@ class DataCleaner:
             return float(revenue)
         
         if isinstance(revenue, str):
-            parsed = parse_revenue(revenue)
+            revenue_str = revenue.strip()
+            if not revenue_str:
+                return 0.0
+            
+            # Быстрый путь для чисел, записанных строкой ("986900000", "227.3")
+            if revenue_str.replace('.', '', 1).isdecimal():
+                return float(revenue_str)
+            
+            parsed = parse_revenue(revenue_str)
             return parsed if parsed else 0.0
         
         return 0.0
@@ -132,15 +315,16 @@ class DataCleaner:
     
     def _clean_segment_tag(self, segment: str) -> str:
         """Очистка тега сегмента"""
-        if not segment:
+        if not segment or not isinstance(segment, str):
             return ""
         
         segment_upper = segment.upper()
         
         # Проверяем валидные теги
-        valid_tags = ["BTL", "SOUVENIR", "FULL_CYCLE", "COMM_GROUP", "EVENT", "PROMO"]
+        if segment_upper in _VALID_SEGMENTS:
+            return segment_upper
         
-        for tag in valid_tags:
+        for tag in _SEGMENT_PRIORITY:
             if tag in segment_upper:
                 return tag
         
@@ -148,24 +332,17 @@ class DataCleaner:
     
     def _clean_source(self, source: str) -> str:
         """Очистка источника данных"""
-        if not source:
+        if not source or not isinstance(source, str):
             return "unknown"
         
         source_lower = source.lower()
         
         # Стандартизируем источники
-        if 'rrar' in source_lower or 'alladvertising' in source_lower:
-            return 'rrar_2025'
-        elif 'marketing-tech' in source_lower or 'marketing_tech' in source_lower:
-            return 'marketing_tech'
-        elif 'fns' in source_lower:
-            return 'fns_open_data'
-        elif 'rusprofile' in source_lower:
-            return 'rusprofile'
-        elif 'list-org' in source_lower or 'list_org' in source_lower:
-            return 'list_org'
-        
-        return source.lower()
+        for keys, canonical in _SOURCE_PATTERNS:
+            if any(key in source_lower for key in keys):
+                return canonical
+        
+        return source_lower
     
     def _clean_okved(self, okved: str) -> str:
         """Очистка ОКВЭД кода"""
@@ -173,7 +350,7 @@ class DataCleaner:
             return ""
         
         # Извлекаем код ОКВЭД (обычно формат XX.XX.X)
-        okved_match = re.search(r'\d{2}\.\d{1,2}(?:\.\d{1,2})?', str(okved))
+        okved_match = _OKVED_RE.search(str(okved))
         return okved_match.group() if okved_match else ""
     
     def _clean_employees(self, employees: Any) -> int:
@@ -181,37 +358,33 @@ class DataCleaner:
         try:
             if isinstance(employees, str):
                 # Извлекаем число из строки
-                numbers = re.findall(r'\d+', employees)
-                if numbers:
-                    return int(numbers[0])
+                match = _NUMBER_RE.search(employees)
+                if match:
+                    return int(match.group())
             return int(employees) if employees else 0
         except (ValueError, TypeError):
             return 0
     
     def _clean_url(self, url: str) -> str:
         """Очистка URL"""
-        if not url:
+        if not url or not isinstance(url, str):
             return ""
         
         url = url.strip()
         
+        # Отсекаем заведомо невалидные и слишком длинные строки до regex
+        if len(url) > _MAX_URL_LENGTH or not url[:8].lower().startswith(_URL_PREFIXES):
+            return ""
+        
         # Проверяем валидность URL
-        url_pattern = re.compile(
-            r'^https?://'  # протокол
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # домен
-            r'localhost|'  # localhost
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # IP
-            r'(?::\d+)?'  # порт
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-        
-        return url if url_pattern.match(url) else ""
+        return url if _URL_RE.match(url) else ""
     
     def _clean_description(self, description: str) -> str:
         """Очистка описания"""
-        if not description:
+        if not description or not isinstance(description, str):
             return ""
         
-        desc = clean_text(description)
+        desc = clean_text(description[:_MAX_FIELD_LENGTH])
         
         # Ограничиваем длину
         if len(desc) > 300:
@@ -221,28 +394,15 @@ class DataCleaner:
     
     def _clean_region(self, region: str) -> str:
         """Очистка региона"""
-        if not region:
+        if not region or not isinstance(region, str):
             return ""
         
-        region = clean_text(region)
-        
-        # Стандартизируем названия регионов
-        region_mapping = {
-            'москва': 'Москва',
-            'moscow': 'Москва',
-            'спб': 'Санкт-Петербург',
-            'санкт-петербург': 'Санкт-Петербург',
-            'питер': 'Санкт-Петербург',
-            'petersburg': 'Санкт-Петербург',
-            'екатеринбург': 'Екатеринбург',
-            'новосибирск': 'Новосибирск',
-            'казань': 'Казань',
-            'нижний новгород': 'Нижний Новгород',
-            'ростов-на-дону': 'Ростов-на-Дону'
-        }
+        region = clean_text(region[:_MAX_FIELD_LENGTH])
         
+        # Стандартизируем названия регионов: ключи проверяются в порядке _REGION_MAPPING,
+        # чтобы при нескольких городах в строке результат не зависел от их позиции
         region_lower = region.lower()
-        for key, value in region_mapping.items():
+        for key, value in _REGION_MAPPING.items():
             if key in region_lower:
                 return value
         
@@ -250,16 +410,23 @@ class DataCleaner:
     
     def _clean_contacts(self, contacts: str) -> str:
         """Очистка контактов"""
-        if not contacts:
+        # Номер телефона может прийти числом; остальные нестроковые значения (NaN, None) пропускаем
+        if isinstance(contacts, int) and not isinstance(contacts, bool):
+            contacts = str(contacts)
+        if not contacts or not isinstance(contacts, str):
             return ""
         
-        contacts = clean_text(contacts)
+        contacts = clean_text(contacts[:_MAX_FIELD_LENGTH])
         
-        # Проверяем, что это телефон или email
-        phone = extract_phone(contacts)
-        email = extract_email(contacts)
+        # Проверяем, что это телефон или email: один проход, телефон приоритетнее
+        email = None
+        for match in _CONTACT_RE.finditer(contacts):
+            if match.lastgroup == 'phone':
+                return match.group().strip()
+            if email is None:
+                email = match.group()
         
-        return phone or email or contacts[:50]
+        return email or contacts[:50]
     
     def _is_valid_company(self, company: Dict[str, Any]) -> bool:
         """
@@ -302,6 +469,22 @@ class DataCleaner:
         self.logger.info(f"Отфильтровано {len(relevant_companies)} релевантных компаний из {len(companies)}")
         return relevant_companies
     
+    def relevance_mask(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Векторизованная проверка релевантности (те же условия, что и в _is_relevant)
+        
+        Args:
+            df: DataFrame очищенных компаний
+            
+        Returns:
+            Булева маска релевантных строк
+        """
+        return (
+            df['segment_tag'].isin(_VALID_SEGMENTS)
+            | df['okved_main'].str.contains(_RELEVANT_OKVED_RE)
+            | (df['description'] + ' ' + df['name']).str.contains(_BTL_KEYWORDS_RE)
+        )
+    
     def _is_relevant_company(self, company: Dict[str, Any]) -> bool:
         """
         Проверка релевантности компании
@@ -312,24 +495,12 @@ class DataCleaner:
         Returns:
             True если компания релевантна
         """
-        # 1. Проверяем сегмент
-        segment = company.get('segment_tag', '')
-        if segment in ['BTL', 'SOUVENIR', 'FULL_CYCLE', 'COMM_GROUP', 'EVENT', 'PROMO']:
-            return True
-        
-        # 2. Проверяем ОКВЭД
-        okved = company.get('okved_main', '')
-        relevant_okved = ['73.11', '82.30', '47.78.3', '73.20', '82.99']
-        if any(code in okved for code in relevant_okved):
-            return True
-        
-        # 3. Проверяем описание на ключевые слова
-        description = (company.get('description', '') + ' ' + company.get('name', '')).lower()
-        
-        if any(keyword in description for keyword in BTL_KEYWORDS):
-            return True
-        
-        return False
+        return _is_relevant(
+            company.get('segment_tag', ''),
+            company.get('okved_main', ''),
+            company.get('description', ''),
+            company.get('name', '')
+        )
     
     def to_dataframe(self, companies: List[Dict[str, Any]]) -> pd.DataFrame:
         """
@@ -344,24 +515,14 @@ class DataCleaner:
         if not companies:
             return pd.DataFrame()
         
-        df = pd.DataFrame(companies)
-        
-        # Обеспечиваем наличие всех необходимых колонок
-        required_columns = [
-            'inn', 'name', 'revenue_year', 'revenue', 'segment_tag', 'source',
-            'okved_main', 'employees', 'site', 'description', 'region', 'contacts', 'rating_ref'
-        ]
-        
-        for col in required_columns:
-            if col not in df.columns:
-                df[col] = ''
+        # Строим DataFrame по колонкам: без вывода схемы по словарям и без досоздания колонок
+        data = {col: [company.get(col, '') for company in companies] for col in _OUTPUT_COLUMNS}
         
         # Устанавливаем правильные типы данных
-        df['revenue'] = pd.to_numeric(df['revenue'], errors='coerce').fillna(0)
-        df['employees'] = pd.to_numeric(df['employees'], errors='coerce').fillna(0)
-        df['revenue_year'] = pd.to_numeric(df['revenue_year'], errors='coerce').fillna(2024)
+        for col, default in _NUMERIC_DEFAULTS.items():
+            data[col] = pd.to_numeric(pd.Series(data[col], dtype=object), errors='coerce').fillna(default)
         
-        return df[required_columns]
+        return pd.DataFrame(data, copy=False)
     
     def save_cleaned_data(self, companies: List[Dict[str, Any]], filename: str = "cleaned_data.csv") -> None:
         """
@@ -372,8 +533,25 @@ class DataCleaner:
             filename: Имя файла
         """
         try:
-            df = self.to_dataframe(companies)
-            df.to_csv(f"data/interim/{filename}", index=False, encoding='utf-8')
+            # Очищенные записи уже типизированы, поэтому пишем их напрямую без DataFrame
+            write_csv(companies, f"data/interim/{filename}", _OUTPUT_COLUMNS)
+            
+            self.logger.info(f"Очищенные данные сохранены в {filename}")
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения очищенных данных: {e}")
+    
+    def save_cleaned_df(self, df: pd.DataFrame, filename: str = "cleaned_data.csv") -> None:
+        """
+        Сохранение очищенных данных из DataFrame (результат clean_companies_df)
+        
+        Args:
+            df: DataFrame очищенных компаний
+            filename: Имя файла
+        """
+        try:
+            rows = df[_OUTPUT_COLUMNS].to_numpy(dtype=object).tolist()
+            write_csv_rows(rows, f"data/interim/{filename}", _OUTPUT_COLUMNS)
             
             self.logger.info(f"Очищенные данные сохранены в {filename}")
             
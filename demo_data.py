@@ -2,10 +2,13 @@
 """
 Генерация демонстрационных данных для тестирования системы
 """
-import json
-import random
+from collections import defaultdict
+from pathlib import Path
 from typing import List, Dict, Any
 
+import numpy as np
+import orjson
+
 def generate_demo_companies() -> List[Dict[str, Any]]:
     """Генерация демонстрационных данных компаний"""
     
@@ -168,8 +171,6 @@ def generate_demo_companies() -> List[Dict[str, Any]]:
 def generate_additional_companies() -> List[Dict[str, Any]]:
     """Генерация дополнительных компаний для достижения 100+"""
     
-    additional_companies = []
-    
     # Базовые шаблоны для генерации
     base_names = [
         "Промо Центр", "Event Pro", "БТЛ Маркет", "Активация Плюс", "Промо Лидер",
@@ -181,31 +182,45 @@ def generate_additional_companies() -> List[Dict[str, Any]]:
     regions = ["Москва", "Санкт-Петербург", "Екатеринбург", "Новосибирск", "Казань", "Нижний Новгород"]
     segments = ["BTL", "EVENT", "SOUVENIR", "FULL_CYCLE", "PROMO"]
     sources = ["rrar_2025", "marketing_tech", "list_org"]
+    okveds = ["73.11", "82.30", "47.78.3"]
     
-    for i, base_name in enumerate(base_names):
-        # Генерируем случайный ИНН (не валидный, для демонстрации)
-        inn = f"77{random.randint(10000000, 99999999)}"
-        
-        # Генерируем выручку от 200 млн до 2 млрд
-        revenue = random.randint(200000000, 2000000000)
-        
-        company = {
+    # Генерируем все случайные поля массивами за один проход генератора;
+    # tolist() возвращает обычные int/str, пригодные для сериализации
+    n = len(base_names)
+    rng = np.random.default_rng()
+    
+    # Случайный ИНН (не валидный, для демонстрации) и выручка от 200 млн до 2 млрд
+    inns = rng.integers(10000000, 99999999, size=n, endpoint=True).tolist()
+    revenues = rng.integers(200000000, 2000000000, size=n, endpoint=True).tolist()
+    years = rng.choice([2023, 2024], size=n).tolist()
+    segment_tags = rng.choice(segments, size=n).tolist()
+    source_tags = rng.choice(sources, size=n).tolist()
+    okved_codes = rng.choice(okveds, size=n).tolist()
+    employees = rng.integers(10, 500, size=n, endpoint=True).tolist()
+    company_regions = rng.choice(regions, size=n).tolist()
+    phone_codes = rng.integers(100, 999, size=n, endpoint=True).tolist()
+    phone_parts = rng.integers(10, 99, size=(n, 2), endpoint=True).tolist()
+    
+    additional_companies = [
+        {
             "name": base_name,
-            "inn": inn,
+            "inn": f"77{inn}",
             "revenue": revenue,
-            "revenue_year": random.choice([2023, 2024]),
-            "segment_tag": random.choice(segments),
-            "source": random.choice(sources),
-            "okved_main": random.choice(["73.11", "82.30", "47.78.3"]),
-            "employees": random.randint(10, 500),
+            "revenue_year": year,
+            "segment_tag": segment_tag,
+            "source": source,
+            "okved_main": okved,
+            "employees": employee_count,
             "site": f"https://{base_name.lower().replace(' ', '')}.ru",
             "description": f"Агентство {base_name} специализируется на маркетинговых услугах и промо-активностях",
-            "region": random.choice(regions),
-            "contacts": f"+7 (495) {random.randint(100, 999)}-{random.randint(10, 99)}-{random.randint(10, 99)}",
+            "region": region,
+            "contacts": f"+7 (495) {phone_code}-{part1}-{part2}",
             "rating_ref": ""
         }
-        
-        additional_companies.append(company)
+        for base_name, inn, revenue, year, segment_tag, source, okved, employee_count, region, phone_code, (part1, part2)
+        in zip(base_names, inns, revenues, years, segment_tags, source_tags, okved_codes,
+               employees, company_regions, phone_codes, phone_parts)
+    ]
     
     return additional_companies
 
@@ -221,26 +236,28 @@ def save_demo_data():
     # Объединяем
     all_companies = main_companies + additional_companies
     
-    # Сохраняем в разные файлы источников
-    rrar_companies = [c for c in all_companies if c['source'] == 'rrar_2025']
-    marketing_tech_companies = [c for c in all_companies if c['source'] == 'marketing_tech']
-    other_companies = [c for c in all_companies if c['source'] not in ['rrar_2025', 'marketing_tech']]
-    
-    # Сохраняем данные РРАР
-    with open('data/raw/rrar_data.json', 'w', encoding='utf-8') as f:
-        json.dump(rrar_companies, f, ensure_ascii=False, indent=2)
+    # Сохраняем в разные файлы источников (разбивка за один проход)
+    groups = defaultdict(list)
+    for company in all_companies:
+        source = company['source']
+        groups[source if source in ('rrar_2025', 'marketing_tech') else 'other'].append(company)
     
-    # Сохраняем данные marketing-tech
-    with open('data/raw/marketing_tech_data.json', 'w', encoding='utf-8') as f:
-        json.dump(marketing_tech_companies, f, ensure_ascii=False, indent=2)
+    rrar_companies = groups['rrar_2025']
+    marketing_tech_companies = groups['marketing_tech']
+    other_companies = groups['other']
     
-    # Сохраняем прочие данные
-    with open('data/raw/other_data.json', 'w', encoding='utf-8') as f:
-        json.dump(other_companies, f, ensure_ascii=False, indent=2)
+    # Сохраняем данные по источникам и общий файл: orjson отдает готовые байты
+    raw_dir = Path('data/raw')
+    raw_dir.mkdir(parents=True, exist_ok=True)
     
-    # Общий файл
-    with open('data/raw/all_demo_data.json', 'w', encoding='utf-8') as f:
-        json.dump(all_companies, f, ensure_ascii=False, indent=2)
+    outputs = {
+        'rrar_data.json': rrar_companies,
+        'marketing_tech_data.json': marketing_tech_companies,
+        'other_data.json': other_companies,
+        'all_demo_data.json': all_companies
+    }
+    for filename, companies in outputs.items():
+        (raw_dir / filename).write_bytes(orjson.dumps(companies, option=orjson.OPT_INDENT_2))
     
     print(f"✅ Создано {len(all_companies)} демонстрационных компаний:")
     print(f"   - РРАР: {len(rrar_companies)}")
@@ -3,128 +3,152 @@
 Демонстрационная версия главного модуля с использованием готовых данных
 """
 import os
-import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 
-from src.utils import main_logger
+import numpy as np
+import orjson
+import pandas as pd
+
+from src.utils import main_logger, write_csv_rows, iter_frame_rows
 from src.processors import DataCleaner, DuplicateHandler
 from config import config
 
-def load_demo_data() -> List[Dict[str, Any]]:
+# Файлы с демонстрационными данными
+DEMO_DATA_FILES = [
+    'data/raw/rrar_data.json',
+    'data/raw/marketing_tech_data.json',
+    'data/raw/other_data.json'
+]
+
+def _load_one(file_path: str) -> Optional[List[Dict[str, Any]]]:
     """
-    Загрузка демонстрационных данных из файлов
+    Загрузка одного файла демонстрационных данных
     
+    Args:
+        file_path: Путь к JSON файлу
+        
     Returns:
-        Список всех демонстрационных компаний
+        Список компаний или None, если файла нет или он не читается
+    """
+    if not os.path.exists(file_path):
+        return None
+    
+    try:
+        with open(file_path, 'rb') as f:
+            companies = orjson.loads(f.read())
+        main_logger.info(f"Загружено из {file_path}: {len(companies)} компаний")
+        return companies
+    except Exception as e:
+        main_logger.error(f"Ошибка загрузки {file_path}: {e}")
+        return None
+
+def iter_demo_data() -> Iterator[List[Dict[str, Any]]]:
+    """
+    Потоковая загрузка демонстрационных данных по файлам
+    
+    Файлы читаются параллельно в пуле потоков, а отдаются по одному
+    в исходном порядке, без общего списка всех записей.
+    
+    Yields:
+        Список компаний из очередного файла
     """
-    all_companies = []
+    total = 0
     
     main_logger.info("Загрузка демонстрационных данных")
     
-    # Загружаем данные из файлов
-    data_files = [
-        'data/raw/rrar_data.json',
-        'data/raw/marketing_tech_data.json',
-        'data/raw/other_data.json'
-    ]
-    
-    for file_path in data_files:
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    companies = json.load(f)
-                    all_companies.extend(companies)
-                    main_logger.info(f"Загружено из {file_path}: {len(companies)} компаний")
-            except Exception as e:
-                main_logger.error(f"Ошибка загрузки {file_path}: {e}")
-    
-    main_logger.info(f"Всего загружено демонстрационных данных: {len(all_companies)} записей")
-    return all_companies
+    with ThreadPoolExecutor(max_workers=len(DEMO_DATA_FILES)) as executor:
+        for companies in executor.map(_load_one, DEMO_DATA_FILES):
+            if companies is None:
+                continue
+            
+            total += len(companies)
+            yield companies
+    
+    main_logger.info(f"Всего загружено демонстрационных данных: {total} записей")
 
-def process_demo_data(companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def process_demo_data(batches: Iterable[List[Dict[str, Any]]]) -> pd.DataFrame:
     """
     Обработка демонстрационных данных
     
     Args:
-        companies: Сырые данные компаний
+        batches: Сырые данные компаний, разбитые по файлам
         
     Returns:
-        Обработанные данные компаний
+        DataFrame обработанных компаний
     """
     main_logger.info("Начинаем обработку демонстрационных данных")
     
-    # 1. Очистка данных
+    # 1-4. Все этапы работают с одним DataFrame: батчи очищаются в DataFrame,
+    # дальше маски и дедупликация без промежуточных списков словарей
     cleaner = DataCleaner()
-    cleaned_companies = cleaner.clean_companies_data(companies)
+    frames = [cleaner.clean_companies_df(companies) for companies in batches]
+    cleaned_df = pd.concat(frames, ignore_index=True) if frames else cleaner.clean_companies_df([])
     
-    if cleaned_companies:
-        cleaner.save_cleaned_data(cleaned_companies)
+    if len(cleaned_df):
+        cleaner.save_cleaned_df(cleaned_df)
     
-    # 2. Фильтрация по релевантности
-    relevant_companies = cleaner.filter_by_relevance(cleaned_companies)
+    relevant_df = cleaned_df[cleaner.relevance_mask(cleaned_df)]
+    main_logger.info(f"Отфильтровано {len(relevant_df)} релевантных компаний из {len(cleaned_df)}")
     
-    # 3. Удаление дубликатов
+    # 3. Удаление дубликатов: строки с уникальным ИНН остаются в DataFrame
     dedup_handler = DuplicateHandler()
-    unique_companies = dedup_handler.remove_duplicates(relevant_companies)
+    unique_df = dedup_handler.remove_duplicates_df(relevant_df)
     
-    if unique_companies:
-        dedup_handler.save_deduplicated_data(unique_companies)
+    if len(unique_df):
+        dedup_handler.save_deduplicated_df(unique_df)
     
     # 4. Финальная фильтрация по выручке
-    final_companies = filter_by_revenue(unique_companies)
+    final_companies = filter_by_revenue(unique_df)
     
     # Статистика обработки
-    stats = dedup_handler.get_duplicate_statistics(len(relevant_companies), len(unique_companies))
+    stats = dedup_handler.get_duplicate_statistics(len(relevant_df), len(unique_df))
     main_logger.info(f"Статистика дедупликации: {stats}")
     
     main_logger.info(f"Финальное количество компаний: {len(final_companies)}")
     
     return final_companies
 
-def filter_by_revenue(companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def filter_by_revenue(companies: pd.DataFrame) -> pd.DataFrame:
     """
     Фильтрация компаний по минимальной выручке
     
     Args:
-        companies: Список компаний
+        companies: DataFrame компаний
         
     Returns:
-        Отфильтрованный список компаний
+        Отфильтрованный DataFrame
     """
     min_revenue = config.min_revenue
-    filtered = []
     
-    for company in companies:
-        revenue = company.get('revenue', 0)
-        
-        # Пропускаем компании с нулевой выручкой (данные могут быть неполными)
-        # или с выручкой выше порога
-        if revenue == 0 or revenue >= min_revenue:
-            filtered.append(company)
+    if 'revenue' in companies.columns:
+        revenue = companies['revenue'].fillna(0).to_numpy(dtype=np.float64)
+    else:
+        revenue = np.zeros(len(companies))
+    
+    # Пропускаем компании с нулевой выручкой (данные могут быть неполными)
+    # или с выручкой выше порога - одна векторная маска по колонке
+    mask = (revenue == 0) | (revenue >= min_revenue)
+    filtered = companies[mask].reset_index(drop=True)
     
     main_logger.info(f"После фильтрации по выручке ≥{min_revenue:,}: {len(filtered)} компаний")
     
     return filtered
 
-def generate_final_csv(companies: List[Dict[str, Any]]) -> None:
+def generate_final_csv(df: pd.DataFrame) -> None:
     """
     Генерация финального CSV файла
     
     Args:
-        companies: Обработанные данные компаний
+        df: DataFrame обработанных компаний (результат filter_by_revenue)
     """
     try:
-        import pandas as pd
-        
-        if not companies:
+        if df.empty:
             main_logger.warning("Нет данных для создания CSV")
             return
         
-        # Создаем DataFrame
-        df = pd.DataFrame(companies)
-        
         # Обеспечиваем наличие всех обязательных колонок
         required_columns = [
             'inn', 'name', 'revenue_year', 'revenue', 'segment_tag', 'source'
@@ -136,16 +160,24 @@ def generate_final_csv(companies: List[Dict[str, Any]]) -> None:
         
         all_columns = required_columns + optional_columns
         
-        for col in all_columns:
-            if col not in df.columns:
-                df[col] = ''
+        # Недостающие колонки добавляются одним reindex
+        df = df.reindex(columns=all_columns, fill_value='')
         
-        # Сортируем по выручке (по убыванию)
-        df = df.sort_values('revenue', ascending=False)
+        # Сортируем по выручке (по убыванию): числовая колонка сортируется
+        # без сравнения Python-объектов, даже если в данных были строки
+        df['revenue'] = pd.to_numeric(df['revenue'], errors='coerce').fillna(0).round().astype('int64')
+        df.sort_values('revenue', ascending=False, inplace=True, kind='stable')
         
-        # Сохраняем финальный CSV
+        # Узкие типы: сотрудники - nullable Int32, повторяющиеся строки - категории
+        # (меньше памяти и быстрее value_counts в print_statistics)
+        df['employees'] = pd.to_numeric(df['employees'], errors='coerce').astype('Int32')
+        category_columns = ['segment_tag', 'source', 'region']
+        df[category_columns] = df[category_columns].astype('category')
+        
+        # Сохраняем финальный CSV потоково: строки переводятся в списки блоками
+        # и сразу уходят в csv.writer, полная копия данных не собирается
         output_file = config.output.get('csv_file', 'data/companies.csv')
-        df[all_columns].to_csv(output_file, index=False, encoding='utf-8')
+        write_csv_rows(iter_frame_rows(df), output_file, all_columns)
         
         main_logger.info(f"Финальный CSV сохранен: {output_file}")
         main_logger.info(f"Количество компаний в файле: {len(df)}")
@@ -153,10 +185,16 @@ def generate_final_csv(companies: List[Dict[str, Any]]) -> None:
         # Выводим статистику
         print_statistics(df)
         
-        # Сохраняем также образец в формате Excel
-        excel_file = output_file.replace('.csv', '_sample.xlsx')
-        df.head(20).to_excel(excel_file, index=False, engine='openpyxl')
-        main_logger.info(f"Образец данных сохранен в Excel: {excel_file}")
+        # Образец в формате Excel сохраняем только по флагу в конфигурации
+        if config.output.get('make_excel_sample', False):
+            excel_file = output_file.replace('.csv', '_sample.xlsx')
+            df.head(20).to_excel(
+                excel_file,
+                index=False,
+                engine='xlsxwriter',
+                engine_kwargs={'options': {'constant_memory': True}}
+            )
+            main_logger.info(f"Образец данных сохранен в Excel: {excel_file}")
         
     except Exception as e:
         main_logger.error(f"Ошибка создания финального CSV: {e}")
@@ -190,49 +228,53 @@ def print_statistics(df) -> None:
     
     # Статистика по выручке
     if 'revenue' in df.columns:
-        revenue_stats = df[df['revenue'] > 0]['revenue']
-        if len(revenue_stats) > 0:
-            print(f"\nСтатистика по выручке ({len(revenue_stats)} компаний с данными):")
-            print(f"  Минимальная: {revenue_stats.min():,.0f} руб.")
-            print(f"  Максимальная: {revenue_stats.max():,.0f} руб.")
-            print(f"  Средняя: {revenue_stats.mean():,.0f} руб.")
-            print(f"  Медианная: {revenue_stats.median():,.0f} руб.")
+        revenue = df['revenue']
+        positive_revenue = revenue[revenue > 0]
+        if len(positive_revenue) > 0:
+            # Все четыре показателя одним agg по уже отобранной колонке
+            revenue_stats = positive_revenue.agg(['min', 'max', 'mean', 'median'])
+            print(f"\nСтатистика по выручке ({len(positive_revenue)} компаний с данными):")
+            print(f"  Минимальная: {revenue_stats['min']:,.0f} руб.")
+            print(f"  Максимальная: {revenue_stats['max']:,.0f} руб.")
+            print(f"  Средняя: {revenue_stats['mean']:,.0f} руб.")
+            print(f"  Медианная: {revenue_stats['median']:,.0f} руб.")
             
             # Компании с выручкой >= 200 млн
-            big_companies = df[df['revenue'] >= 200_000_000]
-            print(f"  Компаний с выручкой ≥ 200 млн: {len(big_companies)}")
+            big_count = int((positive_revenue >= 200_000_000).sum())
+            print(f"  Компаний с выручкой ≥ 200 млн: {big_count}")
     
     # Статистика по регионам
     if 'region' in df.columns:
-        region_stats = df[df['region'] != '']['region'].value_counts().head(5)
+        region_stats = df['region'].value_counts().drop('', errors='ignore').head(5)
         if len(region_stats) > 0:
             print("\nТоп-5 регионов:")
             for region, count in region_stats.items():
                 print(f"  {region}: {count}")
     
     # Полнота данных
+    # Заполненность всех колонок считается одним сравнением по блоку колонок
     print(f"\nПолнота данных:")
-    for col in ['inn', 'revenue', 'site', 'contacts', 'okved_main']:
-        if col in df.columns:
-            filled = len(df[df[col] != ''])
-            percentage = (filled / len(df)) * 100
-            print(f"  {col}: {filled}/{len(df)} ({percentage:.1f}%)")
+    fill_columns = [col for col in ['inn', 'revenue', 'site', 'contacts', 'okved_main'] if col in df.columns]
+    filled_counts = (df[fill_columns] != '').sum()
+    for col, filled in filled_counts.items():
+        percentage = (filled / len(df)) * 100
+        print(f"  {col}: {filled}/{len(df)} ({percentage:.1f}%)")
     
     print("="*60 + "\n")
 
-def show_sample_data(companies: List[Dict[str, Any]], count: int = 5) -> None:
+def show_sample_data(companies: pd.DataFrame, count: int = 5) -> None:
     """
     Показ образца данных
     
     Args:
-        companies: Список компаний
+        companies: DataFrame компаний
         count: Количество компаний для показа
     """
     print("\n" + "="*60)
     print("ОБРАЗЕЦ ДАННЫХ")
     print("="*60)
     
-    for i, company in enumerate(companies[:count]):
+    for i, company in enumerate(companies.head(count).to_dict('records')):
         print(f"\n{i+1}. {company.get('name', 'N/A')}")
         print(f"   ИНН: {company.get('inn', 'N/A')}")
         print(f"   Выручка: {company.get('revenue', 0):,.0f} руб. ({company.get('revenue_year', 'N/A')})")
@@ -254,17 +296,15 @@ def main():
     print("="*60)
     
     try:
-        # Загружаем демонстрационные данные
-        companies = load_demo_data()
-        
-        if not companies:
+        # Проверяем наличие демонстрационных данных
+        if not any(os.path.exists(file_path) for file_path in DEMO_DATA_FILES):
             print("❌ Не найдены демонстрационные данные. Запустите demo_data.py")
             return
         
-        # Обработка данных
-        processed_companies = process_demo_data(companies)
+        # Обработка данных (загрузка идет потоково по файлам)
+        processed_companies = process_demo_data(iter_demo_data())
         
-        if not processed_companies:
+        if processed_companies.empty:
             main_logger.error("Не получено обработанных данных")
             return
         
@@ -1,11 +1,90 @@
 """
 Модуль для обработки дубликатов компаний
 """
-from typing import List, Dict, Any, Optional, Set
+import re
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Set
+import numpy as np
 import pandas as pd
-from difflib import SequenceMatcher
+from rapidfuzz import fuzz, process
 
-from ..utils import main_logger
+from ..utils import main_logger, write_csv, write_csv_rows
+
+# Вхождение одного названия в другое учитывается для названий длиннее 5 символов
+_CONTAINMENT_MIN_LEN = 6
+
+# Порог посимвольной схожести (fuzz.ratio) - тот же, что по умолчанию в _records_similar;
+# матрица схожести считается блоками строк не больше _FUZZY_BLOCK_CELLS ячеек
+_FUZZY_CUTOFF = 80
+_FUZZY_BLOCK_CELLS = 4_000_000
+
+# Предкомпилированные выражения для нормализации названий
+_RE_QUOTES = re.compile(r'["\'\(\)\[\]«»]')
+_RE_NONWORD = re.compile(r'[^\w\s]')
+_RE_WS = re.compile(r'\s+')
+
+# Организационно-правовые формы одной альтернацией: длинные первыми, чтобы полные
+# формы удалялись целиком, и только как отдельные слова (не внутри «типография»)
+_LEGAL_FORMS = [
+    'ооо', 'зао', 'оао', 'ао', 'ип', 'пао',
+    'общество с ограниченной ответственностью',
+    'закрытое акционерное общество',
+    'открытое акционерное общество',
+    'акционерное общество',
+    'публичное акционерное общество',
+    'индивидуальный предприниматель'
+]
+_LEGAL_FORMS_RE = re.compile(
+    r'\b(?:' + '|'.join(re.escape(form) for form in sorted(_LEGAL_FORMS, key=len, reverse=True)) + r')\b'
+)
+
+# Поля, для которых при слиянии берется максимум / самое длинное значение
+_NUMERIC_MAX_KEYS = frozenset({'revenue', 'employees'})
+_LONGEST_KEYS = frozenset({'description'})
+
+# Приоритет источникам по качеству данных
+SOURCE_PRIORITY = {
+    'fns_open_data': 5,
+    'marketing_tech': 4,
+    'rrar_2025': 3,
+    'rusprofile': 2,
+    'list_org': 1
+}
+
+def _company_score(company: Dict[str, Any]) -> int:
+    """
+    Оценка полноты записи компании за один проход по ее полям
+    
+    Args:
+        company: Данные компании
+        
+    Returns:
+        Заполненные поля + приоритет источника + бонусы за выручку и ИНН
+    """
+    filled_fields = 0
+    for value in company.values():
+        if value and (not isinstance(value, str) or value.strip()):
+            filled_fields += 1
+    
+    source_score = SOURCE_PRIORITY.get(company.get('source', ''), 0)
+    
+    # Бонус за наличие выручки > 0
+    revenue_bonus = 10 if (company.get('revenue', 0) or 0) > 0 else 0
+    
+    # Бонус за наличие ИНН
+    inn_bonus = 5 if company.get('inn', '') else 0
+    
+    return filled_fields + source_score + revenue_bonus + inn_bonus
+
+class _NameRecord:
+    """Нормализованное название с предвычисленными признаками для сравнения"""
+    
+    __slots__ = ('name', 'length', 'words')
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.length = len(name)
+        self.words = frozenset(name.split())
 
 class DuplicateHandler:
     """Класс для обработки дубликатов компаний"""
@@ -25,22 +104,13 @@ class DuplicateHandler:
         """
         self.logger.info(f"Начинаем обработку дубликатов для {len(companies)} компаний")
         
-        # 1. Группируем по ИНН
-        inn_groups = self._group_by_inn(companies)
+        # 1. Группы по ИНН: колоночное слияние в DataFrame
+        unique_companies = self._merge_inn_groups_df(companies)
         
         # 2. Обрабатываем компании без ИНН отдельно
         no_inn_companies = [c for c in companies if not c.get('inn')]
         name_groups = self._group_by_similarity(no_inn_companies)
         
-        # 3. Объединяем результаты
-        unique_companies = []
-        
-        # Обрабатываем группы по ИНН
-        for inn, group in inn_groups.items():
-            if inn:  # Пропускаем пустые ИНН
-                merged_company = self._merge_company_group(group)
-                unique_companies.append(merged_company)
-        
         # Обрабатываем группы по названиям
         for group in name_groups:
             merged_company = self._merge_company_group(group)
@@ -50,26 +120,136 @@ class DuplicateHandler:
         
         return unique_companies
     
-    def _group_by_inn(self, companies: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    def remove_duplicates_df(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        Группировка компаний по ИНН
+        Удаление дубликатов из DataFrame компаний
+        
+        Те же правила, что и в remove_duplicates, но строки с уникальным ИНН
+        остаются в DataFrame: в словари превращаются только группы дубликатов
+        по ИНН и компании без ИНН (для нечеткого сравнения названий).
+        
+        Args:
+            df: DataFrame компаний с возможными дубликатами
+        
+        Returns:
+            DataFrame уникальных компаний
+        """
+        if df.empty or 'inn' not in df.columns:
+            return pd.DataFrame(self.remove_duplicates(df.to_dict('records')))
+        
+        self.logger.info(f"Начинаем обработку дубликатов для {len(df)} компаний")
+        
+        df = df.reset_index(drop=True)
+        inn = df['inn'].where(df['inn'].notna(), '').astype(str).str.strip()
+        has_inn = inn != ''
+        duplicated = has_inn & inn.duplicated(keep=False)
+        
+        # Позиция первого появления ИНН задает порядок результата
+        first_pos = pd.Series(np.arange(len(df)), index=df.index).groupby(inn, sort=False).transform('first')
+        
+        parts = [df[has_inn & ~duplicated].assign(_pos=first_pos[has_inn & ~duplicated])]
+        
+        # 1. Группы по ИНН
+        if duplicated.any():
+            merged = pd.DataFrame(self._merge_inn_groups_df(df[duplicated].to_dict('records')))
+            merged['_pos'] = first_pos[duplicated].drop_duplicates().to_numpy()
+            parts.append(merged)
+        
+        unique_df = pd.concat(parts).sort_values('_pos', kind='stable').drop(columns='_pos')
+        
+        # 2. Компании без ИНН - нечеткая группировка по названиям
+        if not has_inn.all():
+            name_groups = self._group_by_similarity(df[~has_inn].to_dict('records'))
+            no_inn_df = pd.DataFrame([self._merge_company_group(group) for group in name_groups])
+            unique_df = pd.concat([unique_df, no_inn_df])
+        
+        unique_df = unique_df.reset_index(drop=True)
+        
+        self.logger.info(f"После удаления дубликатов: {len(unique_df)} уникальных компаний")
+        
+        return unique_df
+
+    def _merge_inn_groups_df(self, companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Колоночное слияние компаний с одинаковым ИНН
+        
+        Повторяет правила _merge_company_group: базовая запись выбирается по
+        _company_score, пустые поля заполняются из остальных записей по порядку,
+        для выручки и сотрудников берется максимум, для описания - самое длинное,
+        источники объединяются. Записи с уникальным ИНН возвращаются как есть.
         
         Args:
             companies: Список компаний
             
         Returns:
-            Словарь групп по ИНН
+            Список компаний с уникальными ИНН в порядке первого появления
         """
-        inn_groups = {}
+        if not companies:
+            return []
+        
+        df = pd.DataFrame(companies)
+        if 'inn' not in df.columns:
+            return []
+        
+        inn = df['inn'].where(df['inn'].notna(), '').astype(str).str.strip()
+        has_inn = inn != ''
+        duplicated = has_inn & inn.duplicated(keep=False)
+        
+        merged_by_inn = {}
+        if duplicated.any():
+            group_df = df[duplicated]
+            keys = inn[duplicated]
+            
+            # Базовая запись группы - первая с максимальной оценкой, как у max()
+            scores = pd.Series([_company_score(companies[i]) for i in group_df.index], index=group_df.index)
+            base_index = scores.groupby(keys, sort=False).idxmax()
+            
+            # Порядок внутри группы: базовая запись, затем остальные в исходном порядке
+            is_other = pd.Series(~group_df.index.isin(base_index.values), index=group_df.index)
+            ordered = group_df.loc[is_other.sort_values(kind='stable').index]
+            ordered_keys = keys.loc[ordered.index]
+            
+            merged = pd.DataFrame(index=base_index.index)
+            for col in group_df.columns:
+                values = ordered[col]
+                
+                if col in _NUMERIC_MAX_KEYS:
+                    merged[col] = values.groupby(ordered_keys, sort=False).max()
+                
+                elif col in _LONGEST_KEYS:
+                    lengths = values.where(values.notna(), '').astype(str).str.len()
+                    longest = lengths.groupby(ordered_keys, sort=False).idxmax()
+                    merged[col] = pd.Series(values.loc[longest.values].values, index=longest.index)
+                
+                elif col == 'source':
+                    merged[col] = group_df[col].groupby(keys, sort=False).agg(
+                        lambda s: ', '.join(dict.fromkeys(v for v in s if isinstance(v, str) and v))
+                    )
+                
+                else:
+                    # Первое непустое значение; если все пустые - значение базовой записи
+                    empty = values.map(lambda v: v is None or v != v or not v
+                                       or (isinstance(v, str) and not v.strip()))
+                    first = values.where(~empty).groupby(ordered_keys, sort=False).first()
+                    base_values = pd.Series(df.loc[base_index.values, col].values, index=base_index.index)
+                    merged[col] = first.reindex(base_index.index).fillna(base_values)
+                    if merged[col].isna().any():
+                        merged[col] = merged[col].astype(object).where(merged[col].notna(), '')
+                    elif values.dtype != object:
+                        merged[col] = merged[col].astype(values.dtype)
+            
+            merged_by_inn = dict(zip(merged.index, merged.to_dict('records')))
+            self.logger.debug(f"Объединено {int(duplicated.sum())} записей в {len(merged_by_inn)} компаний по ИНН")
         
-        for company in companies:
-            inn = company.get('inn', '').strip()
-            if inn:
-                if inn not in inn_groups:
-                    inn_groups[inn] = []
-                inn_groups[inn].append(company)
+        # Собираем результат в порядке первого появления ИНН
+        unique_companies = []
+        for i, key, is_duplicated in zip(df.index[has_inn], inn[has_inn], duplicated[has_inn]):
+            if not is_duplicated:
+                unique_companies.append(companies[i])
+            elif key in merged_by_inn:
+                unique_companies.append(merged_by_inn.pop(key))
         
-        return inn_groups
+        return unique_companies
     
     def _group_by_similarity(self, companies: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
         """
@@ -81,31 +261,98 @@ class DuplicateHandler:
         Returns:
             Список групп схожих компаний
         """
-        groups = []
-        processed_indices = set()
+        if not companies:
+            return []
+        
+        # Нормализуем каждое название один раз
+        names = [self._normalize_name_for_comparison(c.get('name', '')) for c in companies]
         
-        for i, company1 in enumerate(companies):
-            if i in processed_indices:
+        # Одинаковые названия сравниваются один раз: первое вхождение - представитель,
+        # остальные попадают в ту же группу, что и он
+        first_by_name = {}
+        for i, name in enumerate(names):
+            if name:
+                first_by_name.setdefault(name, i)
+        
+        rep_names = list(first_by_name)
+        rep_pos = {name: pos for pos, name in enumerate(rep_names)}
+        
+        candidates = self._similarity_candidates(rep_names)
+        
+        # Группа строится вокруг первого необработанного названия: кандидат входит в нее,
+        # только если похож на само это название (без цепочек через промежуточные)
+        records = [_NameRecord(name) for name in rep_names]
+        seed_of = [None] * len(rep_names)
+        for pos, record in enumerate(records):
+            if seed_of[pos] is not None:
                 continue
-                
-            group = [company1]
-            processed_indices.add(i)
-            
-            name1 = self._normalize_name_for_comparison(company1.get('name', ''))
+            seed_of[pos] = pos
+            for other in candidates(pos):
+                if other > pos and seed_of[other] is None and self._records_similar(record, records[other]):
+                    seed_of[other] = pos
+        
+        # Порядок групп и компаний в них - по первому появлению, как при попарном обходе
+        groups = {}
+        for i, (company, name) in enumerate(zip(companies, names)):
+            key = seed_of[rep_pos[name]] if name else ('empty', i)
+            groups.setdefault(key, []).append(company)
+        
+        return list(groups.values())
+    
+    def _similarity_candidates(self, names: List[str]) -> Callable[[int], Set[int]]:
+        """
+        Кандидаты для сравнения с каждым названием
+        
+        Для каждого правила _records_similar есть точный способ найти все пары,
+        которые могут ему удовлетворять, поэтому ни одна похожая пара не теряется:
+        общие слова и вхождение - по индексам, посимвольная схожесть - матрицей rapidfuzz.
+        
+        Args:
+            names: Разные нормализованные названия (непустые)
             
-            for j, company2 in enumerate(companies[i+1:], i+1):
-                if j in processed_indices:
-                    continue
-                    
-                name2 = self._normalize_name_for_comparison(company2.get('name', ''))
-                
-                if self._are_names_similar(name1, name2):
-                    group.append(company2)
-                    processed_indices.add(j)
+        Returns:
+            Функция: позиция названия -> позиции кандидатов
+        """
+        # Индексы линейного размера; кандидаты собираются по ним при обращении,
+        # чтобы частые слова не раздували память до числа пар
+        by_word = defaultdict(list)
+        by_gram = defaultdict(list)
+        by_prefix = defaultdict(list)
+        
+        for pos, name in enumerate(names):
+            # Общее слово - необходимое условие совпадения по словам
+            for word in set(name.split()):
+                by_word[word].append(pos)
             
-            groups.append(group)
-        
-        return groups
+            # Вхождение: начало короткого названия - подстрока длинного
+            if len(name) >= _CONTAINMENT_MIN_LEN:
+                by_prefix[name[:_CONTAINMENT_MIN_LEN]].append(pos)
+                for gram in {name[start:start + _CONTAINMENT_MIN_LEN] for start in range(len(name) - _CONTAINMENT_MIN_LEN + 1)}:
+                    by_gram[gram].append(pos)
+        
+        # Посимвольная схожесть: все пары с fuzz.ratio не ниже порога, расчет в C
+        fuzzy = defaultdict(list)
+        block_rows = max(1, _FUZZY_BLOCK_CELLS // max(len(names), 1))
+        for block_start in range(0, len(names), block_rows):
+            scores = process.cdist(
+                names[block_start:block_start + block_rows], names,
+                scorer=fuzz.ratio, score_cutoff=_FUZZY_CUTOFF, workers=-1
+            )
+            for row, col in zip(*np.nonzero(scores)):
+                fuzzy[block_start + int(row)].append(int(col))
+        
+        def candidates(pos: int) -> Set[int]:
+            name = names[pos]
+            found = set(fuzzy.get(pos, ()))
+            for word in set(name.split()):
+                found.update(by_word[word])
+            if len(name) >= _CONTAINMENT_MIN_LEN:
+                found.update(by_gram[name[:_CONTAINMENT_MIN_LEN]])
+                for start in range(len(name) - _CONTAINMENT_MIN_LEN + 1):
+                    found.update(by_prefix.get(name[start:start + _CONTAINMENT_MIN_LEN], ()))
+            return found
+        
+        return candidates
     
     def _normalize_name_for_comparison(self, name: str) -> str:
         """
@@ -120,28 +367,13 @@ class DuplicateHandler:
         if not name:
             return ""
         
-        # Приводим к нижнему регистру
-        name = name.lower()
-        
-        # Удаляем организационно-правовые формы
-        legal_forms = [
-            'ооо', 'зао', 'оао', 'ао', 'ип', 'пао',
-            'общество с ограниченной ответственностью',
-            'закрытое акционерное общество',
-            'открытое акционерное общество',
-            'акционерное общество',
-            'публичное акционерное общество',
-            'индивидуальный предприниматель'
-        ]
-        
-        for form in legal_forms:
-            name = name.replace(form, '').strip()
+        # Приводим к нижнему регистру и удаляем организационно-правовые формы
+        name = _LEGAL_FORMS_RE.sub('', name.lower())
         
         # Удаляем кавычки, скобки, специальные символы
-        import re
-        name = re.sub(r'["\'\(\)\[\]«»]', '', name)
-        name = re.sub(r'[^\w\s]', ' ', name)
-        name = re.sub(r'\s+', ' ', name).strip()
+        name = _RE_QUOTES.sub('', name)
+        name = _RE_NONWORD.sub(' ', name)
+        name = _RE_WS.sub(' ', name).strip()
         
         return name
     
@@ -157,6 +389,21 @@ class DuplicateHandler:
         Returns:
             True если названия схожи
         """
+        return self._records_similar(_NameRecord(name1), _NameRecord(name2), threshold)
+    
+    def _records_similar(self, record1: '_NameRecord', record2: '_NameRecord', threshold: float = 0.8) -> bool:
+        """
+        Проверка схожести названий по предвычисленным записям
+        
+        Args:
+            record1: Первое название
+            record2: Второе название
+            threshold: Порог схожести (0-1)
+            
+        Returns:
+            True если названия схожи
+        """
+        name1, name2 = record1.name, record2.name
         if not name1 or not name2:
             return False
         
@@ -164,27 +411,25 @@ class DuplicateHandler:
         if name1 == name2:
             return True
         
-        # Проверяем схожесть по алгоритму Sequence Matcher
-        similarity = SequenceMatcher(None, name1, name2).ratio()
-        
-        if similarity >= threshold:
-            return True
+        # Посимвольная схожесть (rapidfuzz, аналог Sequence Matcher).
+        # Она не превышает 2*min(len)/(len1+len2), поэтому пары с сильно
+        # различающейся длиной сразу переходят к остальным проверкам
+        len1, len2 = record1.length, record2.length
+        if 2 * min(len1, len2) >= threshold * (len1 + len2):
+            if fuzz.ratio(name1, name2, score_cutoff=threshold * 100):
+                return True
         
         # Проверяем, содержит ли одно название другое
-        if len(name1) > 5 and len(name2) > 5:
+        if len1 > 5 and len2 > 5:
             if name1 in name2 or name2 in name1:
                 return True
         
         # Проверяем по словам
-        words1 = set(name1.split())
-        words2 = set(name2.split())
+        words1, words2 = record1.words, record2.words
         
         if words1 and words2:
-            intersection = words1.intersection(words2)
-            union = words1.union(words2)
-            
             # Если пересечение составляет большую часть от объединения
-            word_similarity = len(intersection) / len(union)
+            word_similarity = len(words1 & words2) / len(words1 | words2)
             if word_similarity >= 0.6:
                 return True
         
@@ -207,19 +452,17 @@ class DuplicateHandler:
         base_company = self._select_base_company(group)
         merged = base_company.copy()
         
-        # Объединяем данные из других записей
+        # Один проход по группе: собираем источники и дополняем единственную копию
+        sources = {}
         for company in group:
-            if company == base_company:
+            source = company.get('source', '')
+            if source:
+                sources[source] = None
+            
+            if company is base_company:
                 continue
             
-            merged = self._merge_two_companies(merged, company)
-        
-        # Объединяем источники
-        sources = []
-        for company in group:
-            source = company.get('source', '')
-            if source and source not in sources:
-                sources.append(source)
+            self._merge_into(merged, company)
         
         merged['source'] = ', '.join(sources) if sources else merged.get('source', '')
         
@@ -237,75 +480,33 @@ class DuplicateHandler:
         Returns:
             Базовая компания
         """
-        # Считаем количество заполненных полей для каждой компании
-        def count_filled_fields(company):
-            count = 0
-            for key, value in company.items():
-                if value and str(value).strip():
-                    count += 1
-            return count
-        
-        # Приоритет источникам по качеству данных
-        source_priority = {
-            'fns_open_data': 5,
-            'marketing_tech': 4, 
-            'rrar_2025': 3,
-            'rusprofile': 2,
-            'list_org': 1
-        }
-        
-        def get_company_score(company):
-            filled_fields = count_filled_fields(company)
-            source = company.get('source', '')
-            source_score = source_priority.get(source, 0)
-            
-            # Бонус за наличие выручки > 0
-            revenue_bonus = 10 if company.get('revenue', 0) > 0 else 0
-            
-            # Бонус за наличие ИНН
-            inn_bonus = 5 if company.get('inn', '') else 0
-            
-            return filled_fields + source_score + revenue_bonus + inn_bonus
-        
-        return max(group, key=get_company_score)
+        return max(group, key=_company_score)
     
-    def _merge_two_companies(self, base: Dict[str, Any], additional: Dict[str, Any]) -> Dict[str, Any]:
+    def _merge_into(self, merged: Dict[str, Any], additional: Dict[str, Any]) -> None:
         """
-        Слияние двух записей компаний
+        Дополнение объединенной записи данными другой записи (на месте)
         
         Args:
-            base: Базовая запись
+            merged: Объединенная запись, изменяется на месте
             additional: Дополнительная запись
-            
-        Returns:
-            Объединенная запись
         """
-        merged = base.copy()
-        
-        # Приоритет полей - заполняем пустые поля из дополнительной записи
         for key, value in additional.items():
-            if key in merged:
-                base_value = merged[key]
-                
-                # Если базовое значение пустое, берем из дополнительной записи
-                if not base_value or (isinstance(base_value, str) and not base_value.strip()):
-                    merged[key] = value
-                
-                # Для числовых полей берем максимальное значение
-                elif key in ['revenue', 'employees'] and isinstance(value, (int, float)) and value > 0:
-                    if isinstance(base_value, (int, float)) and base_value == 0:
-                        merged[key] = value
-                    elif isinstance(base_value, (int, float)) and value > base_value:
-                        merged[key] = value
-                
-                # Для описания объединяем, если они разные
-                elif key == 'description' and value and value != base_value:
-                    if len(str(value)) > len(str(base_value)):
-                        merged[key] = value
-            else:
+            base_value = merged.get(key)
+            
+            # Если базовое значение пустое или поля нет, берем из дополнительной записи
+            if not base_value or (isinstance(base_value, str) and not base_value.strip()):
                 merged[key] = value
-        
-        return merged
+            
+            # Для числовых полей берем максимальное значение
+            elif key in _NUMERIC_MAX_KEYS:
+                if (isinstance(value, (int, float)) and value > 0
+                        and isinstance(base_value, (int, float)) and value > base_value):
+                    merged[key] = value
+            
+            # Для описания оставляем более длинное
+            elif key in _LONGEST_KEYS:
+                if value and len(str(value)) > len(str(base_value)):
+                    merged[key] = value
     
     def get_duplicate_statistics(self, original_count: int, unique_count: int) -> Dict[str, Any]:
         """
@@ -353,10 +554,29 @@ class DuplicateHandler:
             filename: Имя файла
         """
         try:
-            df = self.to_dataframe(companies)
-            df.to_csv(f"data/interim/{filename}", index=False, encoding='utf-8')
+            # Колонки - объединение ключей в порядке первого появления, как у DataFrame
+            fieldnames = list(dict.fromkeys(key for company in companies for key in company))
+            write_csv(companies, f"data/interim/{filename}", fieldnames)
             
             self.logger.info(f"Дедуплицированные данные сохранены в {filename}")
             
         except Exception as e:
             self.logger.error(f"Ошибка сохранения дедуплицированных данных: {e}")
+    
+    def save_deduplicated_df(self, df: pd.DataFrame, filename: str = "deduplicated_data.csv") -> None:
+        """
+        Сохранение дедуплицированных данных из DataFrame (результат remove_duplicates_df)
+        
+        Args:
+            df: DataFrame уникальных компаний
+            filename: Имя файла
+        """
+        try:
+            fieldnames = list(df.columns)
+            rows = df.astype(object).where(df.notna(), '').to_numpy().tolist()
+            write_csv_rows(rows, f"data/interim/{filename}", fieldnames)
+            
+            self.logger.info(f"Дедуплицированные данные сохранены в {filename}")
+        
+        except Exception as e:
+            self.logger.error(f"Ошибка сохранения дедуплицированных данных: {e}")
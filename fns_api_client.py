@@ -1,14 +1,44 @@
 """
 Клиент для работы с API ФНС и получения финансовых данных
 """
-import json
-import time
-from typing import List, Dict, Any, Optional
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
+import aiohttp
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from ..utils import main_logger, validate_inn
+from ..utils import main_logger, validate_inn, validate_inn_batch, write_json, get_random_user_agent, FileCache, RateLimiter
 from config import config
 
+# Общие параметры HTTP-запросов к внешним сервисам
+_REQUEST_TIMEOUT = 30
+
+# Пул соединений и повторы для синхронной сессии
+_POOL_CONNECTIONS = 16
+_POOL_MAXSIZE = 32
+_RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+# Ограничения параллельной пакетной загрузки
+_MAX_CONCURRENT_INNS = 16
+_CONNECTIONS_LIMIT = 64
+_CONNECTIONS_PER_HOST = 8
+
+# Кэш ответов на диске: время жизни по типу данных (секунды)
+_CACHE_TTLS = {
+    'company': 30 * 86400,
+    'financial': 7 * 86400,
+    'http': 90 * 86400  # валидаторы ETag/Last-Modified и тело ответа по URL
+}
+_MISS = object()
+
+# Квоты запросов по хостам: (запросов, за период в секундах)
+_HOST_RATE_LIMITS = {
+    'zachestnyibiznes.ru': (1, 1.0),
+    'www.rusprofile.ru': (1, 3.0)
+}
+
 class FNSAPIClient:
     """Клиент для работы с API ФНС и получения данных о компаниях"""
     
@@ -21,20 +51,107 @@ class FNSAPIClient:
             'rusprofile_search': 'https://www.rusprofile.ru/search'
         }
         
-    def get_company_by_inn(self, inn: str) -> Optional[Dict[str, Any]]:
+        # Заголовки собираются один раз на клиент; User-Agent выбирается при создании клиента
+        self._browser_headers = {
+            'User-Agent': get_random_user_agent(),
+            'Accept-Encoding': 'gzip, deflate'
+        }
+        self._api_headers = {**self._browser_headers, 'Accept': 'application/json'}
+        self._dadata_headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            # 'Authorization': f'Token {api_key}'  # Требуется API ключ
+        }
+        
+        # Одна сессия на клиент: keep-alive переиспользует TCP/TLS соединения
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=_POOL_CONNECTIONS,
+            pool_maxsize=_POOL_MAXSIZE,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=_RETRY_STATUSES,
+                allowed_methods=["GET"]
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # Повторные запуски берут ответы по уже запрошенным ИНН из кэша
+        self.cache = FileCache(ttls=_CACHE_TTLS)
+        
+        # Независимые квоты по хостам: запросы к разным сервисам не ждут друг друга
+        self._limits = {
+            host: RateLimiter(max_rate, period)
+            for host, (max_rate, period) in _HOST_RATE_LIMITS.items()
+        }
+        
+        # Сессия aiohttp открывается в `async with FNSAPIClient()` и общая для всех пакетов
+        self._aio_session: Optional[aiohttp.ClientSession] = None
+        
+        # Результаты по ИНН за время жизни клиента: повторные ИНН не идут ни в сеть, ни на диск
+        self._seen_companies: Dict[str, Optional[Dict[str, Any]]] = {}
+        
+        # Запросы по ИНН, которые сейчас выполняются: параллельные запросы одного ИНН объединяются
+        self._inflight_companies: Dict[str, asyncio.Future] = {}
+    
+    async def __aenter__(self) -> "FNSAPIClient":
+        if self._aio_session is None or self._aio_session.closed:
+            self._aio_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=_CONNECTIONS_LIMIT, limit_per_host=_CONNECTIONS_PER_HOST),
+                timeout=aiohttp.ClientTimeout(total=_REQUEST_TIMEOUT)
+            )
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Закрытие общей сессии aiohttp"""
+        if self._aio_session is not None:
+            await self._aio_session.close()
+            self._aio_session = None
+        
+    def get_company_by_inn(self, inn: str, session: Optional[requests.Session] = None) -> Optional[Dict[str, Any]]:
         """
         Получение данных компании по ИНН
         
         Args:
             inn: ИНН компании
+            session: Сессия requests (по умолчанию общая сессия клиента)
             
         Returns:
             Данные компании или None
         """
         if not validate_inn(inn):
-            self.logger.error(f"Некорректный ИНН: {inn}")
+            self.logger.error("Некорректный ИНН: %s", inn)
             return None
         
+        seen = self._seen_companies.get(inn, _MISS)
+        if seen is not _MISS:
+            return seen
+        
+        cache_key = f"company:{inn}"
+        company_data = self.cache.get(cache_key, _MISS)
+        if company_data is _MISS:
+            company_data = self._fetch_company_by_inn(inn, session)
+            self.cache.set(cache_key, company_data)
+        
+        self._seen_companies[inn] = company_data
+        return company_data
+    
+    def _fetch_company_by_inn(self, inn: str, session: Optional[requests.Session] = None) -> Optional[Dict[str, Any]]:
+        """
+        Запрос данных компании по ИНН у источников, без кэша
+        
+        Args:
+            inn: ИНН компании
+            session: Сессия requests (по умолчанию общая сессия клиента)
+            
+        Returns:
+            Данные компании или None
+        """
         # Пробуем разные источники
         company_data = None
         
@@ -44,18 +161,137 @@ class FNSAPIClient:
             return company_data
             
         # 2. Пробуем zachestnyibiznes
-        company_data = self._get_from_zachestnyibiznes(inn)
+        company_data = self._get_from_zachestnyibiznes(inn, session)
         if company_data:
             return company_data
         
         # 3. Пробуем поиск через rusprofile
-        company_data = self._get_from_rusprofile(inn)
+        company_data = self._get_from_rusprofile(inn, session)
         if company_data:
             return company_data
             
-        self.logger.warning(f"Не удалось получить данные для ИНН: {inn}")
+        self.logger.warning("Не удалось получить данные для ИНН: %s", inn)
         return None
     
+    async def get_company_by_inn_async(self, session: aiohttp.ClientSession, inn: str) -> Optional[Dict[str, Any]]:
+        """
+        Асинхронное получение данных компании по ИНН (те же источники, что и get_company_by_inn)
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            inn: ИНН компании
+            
+        Returns:
+            Данные компании или None
+        """
+        if not validate_inn(inn):
+            self.logger.error("Некорректный ИНН: %s", inn)
+            return None
+        
+        seen = self._seen_companies.get(inn, _MISS)
+        if seen is not _MISS:
+            return seen
+        
+        inflight = self._inflight_companies.get(inn)
+        if inflight is not None:
+            return await inflight
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_companies[inn] = future
+        company_data = None
+        
+        try:
+            cache_key = f"company:{inn}"
+            company_data = self.cache.get(cache_key, _MISS)
+            if company_data is _MISS:
+                company_data = await self._fetch_company_by_inn_async(session, inn)
+                self.cache.set(cache_key, company_data)
+            
+            self._seen_companies[inn] = company_data
+        finally:
+            del self._inflight_companies[inn]
+            future.set_result(company_data)
+        
+        return company_data
+    
+    async def _fetch_company_by_inn_async(self, session: aiohttp.ClientSession, inn: str) -> Optional[Dict[str, Any]]:
+        """
+        Асинхронный запрос данных компании по ИНН у источников, без кэша
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            inn: ИНН компании
+            
+        Returns:
+            Данные компании или None
+        """
+        company_data = self._get_from_dadata(inn)
+        if company_data:
+            return company_data
+        
+        # Резервный источник опрашивается только если основной не ответил,
+        # в том же порядке, что и в _fetch_company_by_inn
+        company_data = await self._get_from_zachestnyibiznes_async(session, inn)
+        if company_data:
+            return company_data
+        
+        company_data = await self._get_from_rusprofile_async(session, inn)
+        if company_data:
+            return company_data
+        
+        self.logger.warning("Не удалось получить данные для ИНН: %s", inn)
+        return None
+    
+    def _conditional_headers(self, url: str, base: Dict[str, str]) -> Tuple[Dict[str, str], Optional[Dict[str, Any]]]:
+        """
+        Заголовки условного запроса по сохраненным валидаторам URL
+        
+        Args:
+            url: URL запроса
+            base: Базовые заголовки клиента (возвращаются без копии, если валидаторов нет)
+            
+        Returns:
+            Заголовки запроса и сохраненная запись (или None)
+        """
+        stored = self.cache.get(f"http:{url}")
+        if not stored:
+            return base, None
+        
+        headers = dict(base)
+        if stored.get('etag'):
+            headers['If-None-Match'] = stored['etag']
+        if stored.get('last_modified'):
+            headers['If-Modified-Since'] = stored['last_modified']
+        return headers, stored
+    
+    def _remember_response(self, url: str, response_headers: Any, body: Any) -> None:
+        """
+        Сохранение валидаторов ответа и тела для следующих условных запросов
+        
+        Args:
+            url: URL запроса
+            response_headers: Заголовки ответа
+            body: Тело ответа (JSON или текст)
+        """
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if etag or last_modified:
+            self.cache.set(f"http:{url}", {'etag': etag, 'last_modified': last_modified, 'body': body})
+    
+    def _reuse_stored(self, url: str, stored: Dict[str, Any]) -> Any:
+        """
+        Ответ 304: продлеваем срок сохраненной записи и возвращаем ее тело
+        
+        Args:
+            url: URL запроса
+            stored: Сохраненная запись
+            
+        Returns:
+            Тело ответа из кэша
+        """
+        self.cache.set(f"http:{url}", stored)
+        return stored['body']
+    
     def _get_from_dadata(self, inn: str) -> Optional[Dict[str, Any]]:
         """
         Получение данных через DaData API
@@ -68,13 +304,7 @@ class FNSAPIClient:
         """
         try:
             # Для демонстрации используем публичный эндпоинт (требует API ключ)
-            # В реальном проекте нужен API ключ DaData
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-                # 'Authorization': f'Token {api_key}'  # Требуется API ключ
-            }
+            # В реальном проекте нужен API ключ DaData (заголовки - self._dadata_headers)
             
             data = {
                 'query': inn,
@@ -82,19 +312,20 @@ class FNSAPIClient:
             }
             
             # Пока не делаем реальный запрос без API ключа
-            self.logger.info(f"DaData API требует ключ для ИНН: {inn}")
+            self.logger.info("DaData API требует ключ для ИНН: %s", inn)
             return None
             
         except Exception as e:
-            self.logger.error(f"Ошибка получения данных из DaData для {inn}: {e}")
+            self.logger.error("Ошибка получения данных из DaData для %s: %s", inn, e)
             return None
     
-    def _get_from_zachestnyibiznes(self, inn: str) -> Optional[Dict[str, Any]]:
+    def _get_from_zachestnyibiznes(self, inn: str, session: Optional[requests.Session] = None) -> Optional[Dict[str, Any]]:
         """
         Получение данных через zachestnyibiznes API
         
         Args:
             inn: ИНН компании
+            session: Сессия requests (по умолчанию общая сессия клиента)
             
         Returns:
             Данные компании или None
@@ -102,46 +333,96 @@ class FNSAPIClient:
         try:
             url = f"https://zachestnyibiznes.ru/api/v1/company/{inn}"
             
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
+            headers, stored = self._conditional_headers(url, self._api_headers)
             
-            response = requests.get(url, headers=headers, timeout=30)
+            self._limits['zachestnyibiznes.ru'].wait()
+            response = (session or self.session).get(url, headers=headers, timeout=_REQUEST_TIMEOUT)
             
-            if response.status_code == 200:
-                data = response.json()
+            if response.status_code == 304 and stored:
+                return self._parse_zachestnyibiznes(inn, self._reuse_stored(url, stored))
+            elif response.status_code == 200:
+                data = orjson.loads(response.content)
+                self._remember_response(url, response.headers, data)
+                return self._parse_zachestnyibiznes(inn, data)
+            else:
+                self.logger.warning("Ошибка API zachestnyibiznes для %s: %s", inn, response.status_code)
                 
-                if data and 'success' in data and data['success']:
-                    company_info = data.get('data', {})
+        except Exception as e:
+            self.logger.error("Ошибка получения данных из zachestnyibiznes для %s: %s", inn, e)
+        
+        return None
+    
+    async def _get_from_zachestnyibiznes_async(self, session: aiohttp.ClientSession, inn: str) -> Optional[Dict[str, Any]]:
+        """
+        Асинхронное получение данных через zachestnyibiznes API
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            inn: ИНН компании
+            
+        Returns:
+            Данные компании или None
+        """
+        try:
+            url = f"https://zachestnyibiznes.ru/api/v1/company/{inn}"
+            
+            headers, stored = self._conditional_headers(url, self._api_headers)
+            
+            async with self._limits['zachestnyibiznes.ru']:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304 and stored:
+                        return self._parse_zachestnyibiznes(inn, self._reuse_stored(url, stored))
                     
-                    return {
-                        'inn': inn,
-                        'name': company_info.get('name', ''),
-                        'full_name': company_info.get('full_name', ''),
-                        'okved_main': company_info.get('okved', {}).get('main', {}).get('code', ''),
-                        'okved_description': company_info.get('okved', {}).get('main', {}).get('name', ''),
-                        'region': company_info.get('address', {}).get('region', ''),
-                        'status': company_info.get('status', ''),
-                        'revenue': 0,  # Требуется отдельный запрос за финансы
-                        'revenue_year': 0,
-                        'employees': company_info.get('employees', 0),
-                        'registration_date': company_info.get('registration_date', ''),
-                        'source': 'zachestnyibiznes'
-                    }
-            else:
-                self.logger.warning(f"Ошибка API zachestnyibiznes для {inn}: {response.status_code}")
+                    if response.status == 200:
+                        data = orjson.loads(await response.read())
+                        self._remember_response(url, response.headers, data)
+                        return self._parse_zachestnyibiznes(inn, data)
+                    
+                    self.logger.warning("Ошибка API zachestnyibiznes для %s: %s", inn, response.status)
                 
         except Exception as e:
-            self.logger.error(f"Ошибка получения данных из zachestnyibiznes для {inn}: {e}")
+            self.logger.error("Ошибка получения данных из zachestnyibiznes для %s: %s", inn, e)
+        
+        return None
+    
+    def _parse_zachestnyibiznes(self, inn: str, data: Any) -> Optional[Dict[str, Any]]:
+        """
+        Разбор ответа zachestnyibiznes API
+        
+        Args:
+            inn: ИНН компании
+            data: JSON ответа
+            
+        Returns:
+            Данные компании или None
+        """
+        if data and 'success' in data and data['success']:
+            company_info = data.get('data', {})
+            
+            return {
+                'inn': inn,
+                'name': company_info.get('name', ''),
+                'full_name': company_info.get('full_name', ''),
+                'okved_main': company_info.get('okved', {}).get('main', {}).get('code', ''),
+                'okved_description': company_info.get('okved', {}).get('main', {}).get('name', ''),
+                'region': company_info.get('address', {}).get('region', ''),
+                'status': company_info.get('status', ''),
+                'revenue': 0,  # Требуется отдельный запрос за финансы
+                'revenue_year': 0,
+                'employees': company_info.get('employees', 0),
+                'registration_date': company_info.get('registration_date', ''),
+                'source': 'zachestnyibiznes'
+            }
         
         return None
     
-    def _get_from_rusprofile(self, inn: str) -> Optional[Dict[str, Any]]:
+    def _get_from_rusprofile(self, inn: str, session: Optional[requests.Session] = None) -> Optional[Dict[str, Any]]:
         """
         Получение данных через поиск на rusprofile
         
         Args:
             inn: ИНН компании
+            session: Сессия requests (по умолчанию общая сессия клиента)
             
         Returns:
             Данные компании или None
@@ -150,37 +431,100 @@ class FNSAPIClient:
             # Формируем URL для поиска по ИНН
             search_url = f"https://www.rusprofile.ru/search?query={inn}"
             
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
+            headers, stored = self._conditional_headers(search_url, self._browser_headers)
             
-            time.sleep(2)  # Ограничиваем скорость запросов
-            response = requests.get(search_url, headers=headers, timeout=30)
+            self._limits['www.rusprofile.ru'].wait()  # Ограничиваем скорость запросов
+            response = (session or self.session).get(search_url, headers=headers, timeout=_REQUEST_TIMEOUT)
             
-            if response.status_code == 200:
-                # Здесь должен быть парсинг HTML для извлечения данных
-                # Для демонстрации возвращаем базовую структуру
-                
-                return {
-                    'inn': inn,
-                    'name': '',
-                    'okved_main': '',
-                    'region': '',
-                    'revenue': 0,
-                    'revenue_year': 0,
-                    'employees': 0,
-                    'source': 'rusprofile'
-                }
+            if response.status_code == 304 and stored:
+                return self._parse_rusprofile(inn, self._reuse_stored(search_url, stored))
+            elif response.status_code == 200:
+                self._remember_response(search_url, response.headers, response.text)
+                return self._parse_rusprofile(inn, response.text)
+            
+        except Exception as e:
+            self.logger.error("Ошибка получения данных из rusprofile для %s: %s", inn, e)
+        
+        return None
+    
+    async def _get_from_rusprofile_async(self, session: aiohttp.ClientSession, inn: str) -> Optional[Dict[str, Any]]:
+        """
+        Асинхронное получение данных через поиск на rusprofile
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            inn: ИНН компании
+            
+        Returns:
+            Данные компании или None
+        """
+        try:
+            search_url = f"https://www.rusprofile.ru/search?query={inn}"
+            
+            headers, stored = self._conditional_headers(search_url, self._browser_headers)
+            
+            async with self._limits['www.rusprofile.ru']:  # Ограничиваем скорость запросов
+                async with session.get(search_url, headers=headers) as response:
+                    if response.status == 304 and stored:
+                        return self._parse_rusprofile(inn, self._reuse_stored(search_url, stored))
+                    
+                    if response.status == 200:
+                        html = await response.text()
+                        self._remember_response(search_url, response.headers, html)
+                        return self._parse_rusprofile(inn, html)
             
         except Exception as e:
-            self.logger.error(f"Ошибка получения данных из rusprofile для {inn}: {e}")
+            self.logger.error("Ошибка получения данных из rusprofile для %s: %s", inn, e)
         
         return None
     
+    def _parse_rusprofile(self, inn: str, html: str) -> Dict[str, Any]:
+        """
+        Разбор страницы поиска rusprofile
+        
+        Args:
+            inn: ИНН компании
+            html: HTML страницы
+            
+        Returns:
+            Данные компании
+        """
+        # Здесь должен быть парсинг HTML для извлечения данных
+        # Для демонстрации возвращаем базовую структуру
+        return {
+            'inn': inn,
+            'name': '',
+            'okved_main': '',
+            'region': '',
+            'revenue': 0,
+            'revenue_year': 0,
+            'employees': 0,
+            'source': 'rusprofile'
+        }
+    
     def get_financial_data(self, inn: str) -> Optional[Dict[str, Any]]:
         """
         Получение финансовых данных компании
         
+        Args:
+            inn: ИНН компании
+            
+        Returns:
+            Финансовые данные или None
+        """
+        cache_key = f"financial:{inn}"
+        cached = self.cache.get(cache_key, _MISS)
+        if cached is not _MISS:
+            return cached
+        
+        financial_data = self._fetch_financial_data(inn)
+        self.cache.set(cache_key, financial_data)
+        return financial_data
+    
+    def _fetch_financial_data(self, inn: str) -> Optional[Dict[str, Any]]:
+        """
+        Запрос финансовых данных компании у источников, без кэша
+        
         Args:
             inn: ИНН компании
             
@@ -201,7 +545,7 @@ class FNSAPIClient:
                 return alt_data
                 
         except Exception as e:
-            self.logger.error(f"Ошибка получения финансовых данных для {inn}: {e}")
+            self.logger.error("Ошибка получения финансовых данных для %s: %s", inn, e)
         
         return None
     
@@ -221,11 +565,11 @@ class FNSAPIClient:
             
             # Для получения данных БФО требуется более сложная логика
             # с обработкой форм и сессий
-            self.logger.info(f"БФО данные требуют сложной интеграции для {inn}")
+            self.logger.info("БФО данные требуют сложной интеграции для %s", inn)
             return None
             
         except Exception as e:
-            self.logger.error(f"Ошибка получения БФО данных для {inn}: {e}")
+            self.logger.error("Ошибка получения БФО данных для %s: %s", inn, e)
             return None
     
     def _get_alternative_financial_data(self, inn: str) -> Optional[Dict[str, Any]]:
@@ -253,7 +597,7 @@ class FNSAPIClient:
             }
             
         except Exception as e:
-            self.logger.error(f"Ошибка получения альтернативных финансовых данных для {inn}: {e}")
+            self.logger.error("Ошибка получения альтернативных финансовых данных для %s: %s", inn, e)
             return None
     
     def batch_get_companies(self, inn_list: List[str]) -> List[Dict[str, Any]]:
@@ -266,31 +610,64 @@ class FNSAPIClient:
         Returns:
             Список данных компаний
         """
-        companies = []
+        return asyncio.run(self.batch_get_companies_async(inn_list))
+    
+    async def batch_get_companies_async(self, inn_list: List[str]) -> List[Dict[str, Any]]:
+        """
+        Асинхронное пакетное получение данных: ИНН обрабатываются параллельно
+        в одной HTTP-сессии с ограничением числа одновременных запросов.
+        
+        Внутри `async with FNSAPIClient()` используется общая сессия клиента,
+        иначе сессия открывается на время пакета.
+        
+        Args:
+            inn_list: Список ИНН
+            
+        Returns:
+            Список данных компаний (в порядке inn_list)
+        """
+        if self._aio_session is None:
+            async with self:
+                return await self.batch_get_companies_async(inn_list)
         
-        self.logger.info(f"Получаем данные для {len(inn_list)} компаний")
+        # Некорректные ИНН отсеиваем одной векторной проверкой до запуска запросов
+        valid_mask = validate_inn_batch(inn_list)
+        if not valid_mask.all():
+            self.logger.warning("Пропущено некорректных ИНН: %d", int((~valid_mask).sum()))
+            inn_list = [inn for inn, valid in zip(inn_list, valid_mask.tolist()) if valid]
         
-        for i, inn in enumerate(inn_list):
-            try:
-                self.logger.info(f"Обрабатываем ИНН {i+1}/{len(inn_list)}: {inn}")
+        # Повторные ИНН запрашиваем один раз (порядок первого появления сохраняется)
+        inn_list = list(dict.fromkeys(inn_list))
+        
+        self.logger.info("Получаем данные для %d компаний", len(inn_list))
+        
+        semaphore = asyncio.Semaphore(_MAX_CONCURRENT_INNS)
+        
+        async def fetch(session: aiohttp.ClientSession, i: int, inn: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                self.logger.info("Обрабатываем ИНН %d/%d: %s", i+1, len(inn_list), inn)
                 
-                company_data = self.get_company_by_inn(inn)
+                company_data = await self.get_company_by_inn_async(session, inn)
                 if company_data:
                     # Добавляем финансовые данные
+                    # (новый словарь: company_data может быть общим с self._seen_companies)
                     financial_data = self.get_financial_data(inn)
                     if financial_data:
-                        company_data.update(financial_data)
-                    
-                    companies.append(company_data)
-                
-                # Пауза между запросами
-                time.sleep(2)
+                        company_data = {**company_data, **financial_data}
                 
-            except Exception as e:
-                self.logger.error(f"Ошибка обработки ИНН {inn}: {e}")
-                continue
+                return company_data
+        
+        tasks = [asyncio.create_task(fetch(self._aio_session, i, inn)) for i, inn in enumerate(inn_list)]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        self.logger.info(f"Получено данных для {len(companies)} компаний")
+        companies = []
+        for inn, result in zip(inn_list, results):
+            if isinstance(result, Exception):
+                self.logger.error("Ошибка обработки ИНН %s: %s", inn, result)
+            elif result:
+                companies.append(result)
+        
+        self.logger.info("Получено данных для %d компаний", len(companies))
         return companies
     
     def save_raw_data(self, companies: List[Dict[str, Any]], filename: str = "fns_data.json") -> None:
@@ -302,20 +679,23 @@ class FNSAPIClient:
             filename: Имя файла
         """
         try:
-            with open(f"data/raw/{filename}", 'w', encoding='utf-8') as f:
-                json.dump(companies, f, ensure_ascii=False, indent=2)
+            write_json(companies, f"data/raw/{filename}")
             
-            self.logger.info(f"Данные ФНС сохранены в {filename}")
+            self.logger.info("Данные ФНС сохранены в %s", filename)
             
         except Exception as e:
-            self.logger.error(f"Ошибка сохранения данных ФНС: {e}")
+            self.logger.error("Ошибка сохранения данных ФНС: %s", e)
     
-    def enrich_company_data(self, company: Dict[str, Any]) -> Dict[str, Any]:
+    def enrich_company_data(self, company: Dict[str, Any], session: Optional[requests.Session] = None) -> Dict[str, Any]:
         """
         Обогащение данных компании через API ФНС
         
+        Новая сессия не создается: без session используется общая сессия клиента,
+        поэтому при обогащении в цикле соединения переиспользуются.
+        
         Args:
             company: Данные компании
+            session: Сессия requests (по умолчанию общая сессия клиента)
             
         Returns:
             Обогащенные данные компании
@@ -325,22 +705,17 @@ class FNSAPIClient:
             return company
         
         try:
-            # Получаем дополнительные данные
-            fns_data = self.get_company_by_inn(inn)
-            if fns_data:
-                # Обновляем данные, не перезаписывая существующие
-                for key, value in fns_data.items():
-                    if key not in company or not company[key]:
-                        company[key] = value
-            
-            # Получаем финансовые данные
-            financial_data = self.get_financial_data(inn)
-            if financial_data:
-                for key, value in financial_data.items():
-                    if key not in company or not company[key]:
-                        company[key] = value
-                        
+            fns_data = self.get_company_by_inn(inn, session) or {}
+            financial_data = self.get_financial_data(inn) or {}
+            
+            # Приоритет значений: непустые из компании, затем непустые из ФНС,
+            # затем финансовые данные; существующие значения не перезаписываются
+            merged = {**company, **fns_data, **financial_data}
+            merged.update({key: value for key, value in fns_data.items() if value})
+            merged.update({key: value for key, value in company.items() if value})
+            company.update(merged)
+            
         except Exception as e:
-            self.logger.error(f"Ошибка обогащения данных компании {inn}: {e}")
+            self.logger.error("Ошибка обогащения данных компании %s: %s", inn, e)
         
         return company
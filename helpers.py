@@ -1,17 +1,87 @@
 """
 Вспомогательные функции для работы с данными
 """
+import asyncio
+import csv
+import os
 import re
 import time
 import random
-from typing import Optional, Union, List, Dict, Any
+import threading
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Optional, Union, List, Dict, Any, Iterable, Iterator, Mapping, Sequence
 from urllib.parse import urljoin, urlparse
+import numpy as np
+import orjson
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from config import USER_AGENTS
 
-def clean_text(text: str) -> str:
+from .logger import main_logger
+
+# Верхняя граница паузы между повторами запроса (секунды)
+_BACKOFF_CAP = 30.0
+
+# Общая сессия safe_request: keep-alive пул соединений вместо нового TCP/TLS на каждый запрос.
+# Retry адаптера повторяет только сетевые сбои, HTTP-статусы обрабатывает сам safe_request:
+# без respect_retry_after_header=False urllib3 сам повторял бы 413/429/503 с Retry-After
+_SESSION = requests.Session()
+_SESSION_ADAPTER = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.5, respect_retry_after_header=False)
+)
+_SESSION.mount('https://', _SESSION_ADAPTER)
+_SESSION.mount('http://', _SESSION_ADAPTER)
+
+# Кэш очистки коротких строк: число записей и максимальная длина кэшируемой строки
+_TEXT_CACHE_SIZE = 4096
+_TEXT_CACHE_MAX_LEN = 256
+
+# Размер блока строк DataFrame при потоковой записи CSV
+_CSV_CHUNK_ROWS = 10_000
+
+# Регулярные выражения компилируются один раз при импорте модуля
+_HTML_TAG = re.compile(r'<[^>]+>')
+_WS = re.compile(r'\s+')
+_INN = re.compile(r'\b\d{10,12}\b')
+_INN_FULL = r'\d{10}|\d{12}'
+# Выручка: число (с пробелами-разделителями разрядов) и необязательная единица измерения
+_REV_RE = re.compile(r'(\d[\d\s.,]*)\s*(млрд|млн|тыс|billion|million|thousand)?', re.IGNORECASE)
+_REV_MULT = {
+    'млрд': 1_000_000_000,
+    'billion': 1_000_000_000,
+    'млн': 1_000_000,
+    'million': 1_000_000,
+    'тыс': 1_000,
+    'thousand': 1_000
+}
+_OUTER_QUOTES = re.compile(r'^["\']|["\']$')
+
+# Российские телефоны: +7/8 с кодом или код в скобках - одна альтернация.
+# \b перед 8 не дает принять за телефон хвост ИНН/ОГРН.
+# Шаблоны телефона и email публичны: из них же собирается поиск контактов в DataCleaner
+PHONE_PATTERN = (
+    r'(?:\+7|\b8)[\s\-\(\)]*\d{3}[\s\-\(\)]*\d{3}[\s\-]*\d{2}[\s\-]*\d{2}'
+    r'|\(\d{3}\)[\s\-]*\d{3}[\s\-]*\d{2}[\s\-]*\d{2}'
+)
+EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
+_PHONE = re.compile(PHONE_PATTERN)
+_EMAIL = re.compile(EMAIL_PATTERN)
+
+# Организационно-правовые формы в начале названия - одна альтернация
+_LEGAL_FORMS = re.compile(
+    r'^(?:ООО|ЗАО|ОАО|АО|ИП|Общество с ограниченной ответственностью)\s*["\']?',
+    re.IGNORECASE
+)
+
+def _clean_text(text: str) -> str:
     """
-    Очистка текста от лишних символов и пробелов
+    Очистка непустого текста (без кэша)
     
     Args:
         text: Исходный текст
@@ -19,20 +89,39 @@ def clean_text(text: str) -> str:
     Returns:
         Очищенный текст
     """
-    if not text:
-        return ""
-    
     # Удаляем HTML теги
-    text = re.sub(r'<[^>]+>', '', text)
+    text = _HTML_TAG.sub('', text)
     
     # Удаляем лишние пробелы и переносы
-    text = re.sub(r'\s+', ' ', text)
+    text = _WS.sub(' ', text)
     
     # Убираем пробелы в начале и конце
     text = text.strip()
     
     return text
 
+_clean_short_text = lru_cache(maxsize=_TEXT_CACHE_SIZE)(_clean_text)
+
+def clean_text(text: str) -> str:
+    """
+    Очистка текста от лишних символов и пробелов
+    
+    Args:
+        text: Исходный текст
+        
+    Returns:
+        Очищенный текст
+    """
+    if not text:
+        return ""
+    
+    # Короткие строки (названия, ячейки, пункты меню) повторяются между страницами
+    # и берутся из кэша; длинные тексты не кэшируются, чтобы не держать их в памяти
+    if len(text) <= _TEXT_CACHE_MAX_LEN:
+        return _clean_short_text(text)
+    
+    return _clean_text(text)
+
 def extract_inn(text: str) -> Optional[str]:
     """
     Извлечение ИНН из текста
@@ -47,8 +136,7 @@ def extract_inn(text: str) -> Optional[str]:
         return None
     
     # Паттерн для ИНН (10 или 12 цифр)
-    inn_pattern = r'\b\d{10,12}\b'
-    match = re.search(inn_pattern, text)
+    match = _INN.search(text)
     
     if match:
         inn = match.group()
@@ -71,33 +159,22 @@ def parse_revenue(revenue_str: str) -> Optional[float]:
     if not revenue_str:
         return None
     
-    # Удаляем лишние символы
-    revenue_str = re.sub(r'[^\d,.\s]', '', revenue_str.lower())
-    
-    # Ищем числа
-    numbers = re.findall(r'\d+[,.]?\d*', revenue_str)
-    if not numbers:
+    # Один проход регулярного выражения: число и единица измерения сразу за ним
+    match = _REV_RE.search(revenue_str.lower())
+    if not match:
         return None
     
+    number = ''.join(match.group(1).split()).rstrip('.,')
+    
+    # При обоих разделителях запятая отделяет разряды, иначе она десятичная
+    number = number.replace(',', '') if '.' in number else number.replace(',', '.')
+    
     try:
-        # Берем первое число
-        num_str = numbers[0].replace(',', '.')
-        revenue = float(num_str)
-
-  # Определяем единицы измерения
-        original_str = revenue_str.lower()
-        
-        if 'млрд' in original_str or 'billion' in original_str:
-            revenue *= 1_000_000_000
-        elif 'млн' in original_str or 'million' in original_str:
-            revenue *= 1_000_000
-        elif 'тыс' in original_str or 'thousand' in original_str:
-            revenue *= 1_000
-        
-        return revenue
-        
+        revenue = float(number)
     except ValueError:
         return None
+    
+    return revenue * _REV_MULT.get(match.group(2), 1)
 
 def extract_phone(text: str) -> Optional[str]:
     """
@@ -112,19 +189,9 @@ def extract_phone(text: str) -> Optional[str]:
     if not text:
         return None
     
-    # Паттерны для российских телефонов
-    phone_patterns = [
-        r'\+7[\s\-\(\)]?\d{3}[\s\-\(\)]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}',
-        r'8[\s\-\(\)]?\d{3}[\s\-\(\)]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}',
-        r'\(\d{3}\)[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}'
-    ]
+    match = _PHONE.search(text)
     
-    for pattern in phone_patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group().strip()
-    
-    return None
+    return match.group().strip() if match else None
 
 def extract_email(text: str) -> Optional[str]:
     """
@@ -139,11 +206,12 @@ def extract_email(text: str) -> Optional[str]:
     if not text:
         return None
     
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    match = re.search(email_pattern, text)
+    match = _EMAIL.search(text)
     
     return match.group() if match else None
-  def normalize_company_name(name: str) -> str:
+
+@lru_cache(maxsize=_TEXT_CACHE_SIZE)
+def normalize_company_name(name: str) -> str:
     """
     Нормализация названия компании
     
@@ -159,20 +227,10 @@ def extract_email(text: str) -> Optional[str]:
     name = clean_text(name)
     
     # Удаляем организационно-правовые формы в начале
-    legal_forms = [
-        r'^ООО\s*["\']?',
-        r'^ЗАО\s*["\']?',
-        r'^ОАО\s*["\']?',
-        r'^АО\s*["\']?',
-        r'^ИП\s*["\']?',
-        r'^Общество с ограниченной ответственностью\s*["\']?'
-    ]
-    
-    for pattern in legal_forms:
-        name = re.sub(pattern, '', name, flags=re.IGNORECASE)
+    name = _LEGAL_FORMS.sub('', name, count=1)
     
     # Удаляем кавычки
-    name = re.sub(r'^["\']|["\']$', '', name)
+    name = _OUTER_QUOTES.sub('', name)
     
     return name.strip()
 
@@ -185,22 +243,52 @@ def get_random_user_agent() -> str:
     """
     return random.choice(USER_AGENTS)
 
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Пауза из заголовка Retry-After (секунды или HTTP-дата)
+    
+    Args:
+        headers: Заголовки ответа (requests или aiohttp)
+        
+    Returns:
+        Пауза в секундах или None, если заголовка нет или он не разбирается
+    """
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+    
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
 def safe_request(
     url: str,
     headers: Optional[Dict[str, str]] = None,
     delay: float = 1.0,
     max_retries: int = 3,
-    timeout: int = 30
+    timeout: int = 30,
+    session: Optional[requests.Session] = None
 ) -> Optional[requests.Response]:
     """
     Безопасный HTTP запрос с повторными попытками
     
+    Паузы между повторами - decorrelated jitter в пределах [delay, _BACKOFF_CAP];
+    на 429 приоритет у заголовка Retry-After.
+    
     Args:
         url: URL для запроса
         headers: Заголовки
         delay: Задержка между запросами
         max_retries: Максимальное количество попыток
         timeout: Таймаут запроса
+        session: Сессия requests (по умолчанию общая сессия модуля с пулом соединений)
         
     Returns:
         Response объект или None
@@ -208,51 +296,152 @@ def safe_request(
     if not headers:
         headers = {'User-Agent': get_random_user_agent()}
     
+    http = session or _SESSION
+    prev_wait = delay
+    
     for attempt in range(max_retries):
+        is_last = attempt == max_retries - 1
+        
         try:
             time.sleep(delay + random.uniform(0, 1))
             
-            response = requests.get(url, headers=headers, timeout=timeout)
+            response = http.get(url, headers=headers, timeout=timeout)
             
             if response.status_code == 200:
                 return response
             elif response.status_code == 429:  # Too Many Requests
-                wait_time = delay * (2 ** attempt)  # Exponential backoff
+                if is_last:
+                    main_logger.error(f"Превышен лимит запросов {url}: попытки исчерпаны")
+                    return None
+                
+                wait_time = parse_retry_after(response.headers)
+                if wait_time is None:
+                    wait_time = min(_BACKOFF_CAP, random.uniform(delay, prev_wait * 3))
                 time.sleep(wait_time)
+                prev_wait = max(wait_time, delay)
             else:
                 response.raise_for_status()
                 
         except requests.RequestException as e:
-            if attempt == max_retries - 1:
-                print(f"Ошибка запроса {url}: {e}")
+            if is_last:
+                main_logger.error(f"Ошибка запроса {url}: {e}")
                 return None
             
-            wait_time = delay * (2 ** attempt)
+            wait_time = min(_BACKOFF_CAP, random.uniform(delay, prev_wait * 3))
             time.sleep(wait_time)
+            prev_wait = wait_time
     
     return None
-  def validate_inn(inn: str) -> bool:
+
+class RateLimiter:
+    """Token bucket (GCRA): не более max_rate запросов за period секунд, общий для потоков и корутин"""
+    
+    def __init__(self, max_rate: int, period: float):
+        self.period = period
+        self.interval = period / max_rate
+        self._tat = 0.0  # теоретическое время следующего запроса
+        self._lock = threading.Lock()
+    
+    def _reserve(self) -> float:
+        """
+        Резервирование слота под запрос
+        
+        Returns:
+            Сколько секунд нужно подождать до запроса
+        """
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now)
+            self._tat = tat + self.interval
+        return tat - now - (self.period - self.interval)
+    
+    def wait(self) -> None:
+        """Синхронное ожидание слота"""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+    
+    async def __aenter__(self) -> "RateLimiter":
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+@lru_cache(maxsize=1 << 16)
+def validate_inn(inn: str) -> bool:
     """
     Валидация ИНН
     
+    Результат кэшируется: в пакетах одни и те же ИНН встречаются многократно.
+    
     Args:
         inn: ИНН для проверки
         
     Returns:
         True если ИНН валиден
     """
-    if not inn or not inn.isdigit():
+    if not inn:
         return False
     
-    if len(inn) not in [10, 12]:
+    # Сначала дешевая проверка длины, затем проход по символам
+    length = len(inn)
+    if length != 10 and length != 12:
         return False
     
     # Упрощенная проверка (без контрольных сумм)
-    return True
+    return inn.isdigit()
+
+def validate_inn_batch(inns: Iterable[str]) -> np.ndarray:
+    """
+    Векторная валидация списка ИНН (та же проверка, что и validate_inn)
+    
+    Args:
+        inns: ИНН для проверки
+        
+    Returns:
+        Булев массив: True для валидных ИНН
+    """
+    series = pd.Series(list(inns), dtype=object)
+    return series.str.fullmatch(_INN_FULL, na=False).to_numpy(dtype=bool)
+
+def extract_inn_batch(texts: Iterable[str]) -> List[Optional[str]]:
+    """
+    Векторное извлечение ИНН из списка текстов (та же логика, что и extract_inn)
+    
+    Args:
+        texts: Тексты для поиска ИНН
+        
+    Returns:
+        ИНН или None для каждого текста
+    """
+    found = pd.Series(list(texts), dtype=object).str.extract(f"({_INN.pattern})", expand=False)
+    
+    # Первое совпадение из 11 цифр не является ИНН
+    found = found.where(found.str.len() != 11)
+    
+    return [inn if isinstance(inn, str) else None for inn in found.tolist()]
+
+def chunk_list(items: Iterable[Any], chunk_size: int) -> Iterator[List[Any]]:
+    """
+    Разбивка последовательности на чанки (генератор: в памяти один чанк)
+    
+    Args:
+        items: Исходная последовательность (список или любой итерируемый объект)
+        chunk_size: Размер чанка
+        
+    Yields:
+        Очередной чанк
+    """
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
 
-def chunk_list(lst: List[Any], chunk_size: int) -> List[List[Any]]:
+def chunk_list_materialized(lst: List[Any], chunk_size: int) -> List[List[Any]]:
     """
-    Разбивка списка на чанки
+    Разбивка списка на чанки (сразу весь список чанков)
     
     Args:
         lst: Исходный список
@@ -261,4 +450,71 @@ def chunk_list(lst: List[Any], chunk_size: int) -> List[List[Any]]:
     Returns:
         Список чанков
     """
-    return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
+    return list(chunk_list(lst, chunk_size))
+
+def write_csv(rows: Iterable[Dict[str, Any]], path: str, fieldnames: List[str]) -> None:
+    """
+    Потоковая запись словарей в CSV без промежуточного DataFrame
+    
+    Args:
+        rows: Записи для сохранения
+        path: Путь к файлу
+        fieldnames: Колонки в порядке вывода (лишние ключи игнорируются)
+    """
+    with open(path, 'w', encoding='utf-8', newline='', buffering=1 << 20) as f:
+        writer = csv.DictWriter(
+            f,
+            fieldnames=fieldnames,
+            restval='',
+            extrasaction='ignore',
+            lineterminator='\n'
+        )
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_csv_rows(rows: Iterable[Sequence[Any]], path: str, header: List[str]) -> None:
+    """
+    Запись готовых строк (последовательностей значений) в CSV одним вызовом writerows
+    
+    Args:
+        rows: Строки в порядке колонок header
+        path: Путь к файлу
+        header: Заголовок CSV
+    """
+    with open(path, 'w', encoding='utf-8', newline='', buffering=1 << 20) as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def iter_frame_rows(df: pd.DataFrame, chunk_size: int = _CSV_CHUNK_ROWS) -> Iterator[List[Any]]:
+    """
+    Построчный обход DataFrame блоками (пропуски заменяются пустой строкой)
+    
+    Args:
+        df: DataFrame
+        chunk_size: Количество строк, переводимых в списки за один раз
+        
+    Yields:
+        Значения строки в порядке колонок df
+    """
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        yield from chunk.astype(object).where(chunk.notna(), '').to_numpy().tolist()
+
+def write_json(data: Any, path: str, pretty: bool = False) -> None:
+    """
+    Запись JSON через orjson одним вызовом write (каталог создается при необходимости)
+    
+    Args:
+        data: Данные для сохранения
+        path: Путь к файлу
+        pretty: Форматировать с отступами (для чтения человеком)
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+    
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(data, option=option))
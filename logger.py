@@ -1,10 +1,17 @@
 """
 Модуль для настройки логирования
 """
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
+
+# Ротация файла логов
+_LOG_MAX_BYTES = 50_000_000
+_LOG_BACKUP_COUNT = 5
 
 def setup_logger(
     name: str,
@@ -15,6 +22,9 @@ def setup_logger(
     """
     Настройка логгера с выводом в файл и консоль
     
+    Записи ставятся в очередь, а вывод в консоль и файл (с ротацией) выполняет
+    фоновый QueueListener; он доступен как logger.queue_listener.
+    
     Args:
         name: Имя логгера
         log_file: Путь к файлу логов
@@ -26,7 +36,11 @@ def setup_logger(
     """
     logger = logging.getLogger(name)
     
-    # Очищаем существующие обработчики
+    # Очищаем существующие обработчики и останавливаем прежний фоновый поток
+    previous_listener = getattr(logger, 'queue_listener', None)
+    if previous_listener is not None:
+        atexit.unregister(previous_listener.stop)
+        previous_listener.stop()
     logger.handlers.clear()
     
     # Устанавливаем уровень
@@ -37,20 +51,35 @@ def setup_logger(
         format_string = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     
     formatter = logging.Formatter(format_string)
+    handlers: List[logging.Handler] = []
     
     # Консольный обработчик
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
-    # Файловый обработчик
+    # Файловый обработчик с ротацией
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
         
-        file_handler = logging.FileHandler(log_path, encoding='utf-8')
+        file_handler = RotatingFileHandler(
+            log_path,
+            maxBytes=_LOG_MAX_BYTES,
+            backupCount=_LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    # Вывод выполняется в фоновом потоке, вызывающий код только кладет запись в очередь
+    log_queue: queue.Queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+    
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.queue_listener = listener
     
     return logger
 
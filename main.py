@@ -2,13 +2,17 @@
 """
 Главный модуль для сбора данных о BTL и маркетинговых агентствах
 """
+import asyncio
 import os
-import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any
 
-from src.utils import main_logger
+import numpy as np
+import pandas as pd
+
+from src.utils import main_logger, write_csv_rows, iter_frame_rows
 from src.scrapers import RRARScraper, MarketingTechScraper
 from src.scrapers.fns_api_client import FNSAPIClient
 from src.processors import DataCleaner, DuplicateHandler
@@ -28,6 +32,18 @@ def setup_directories():
     
     main_logger.info("Директории созданы/проверены")
 
+def setup_event_loop():
+    """Цикл событий uvloop для асинхронных парсеров, если он установлен"""
+    try:
+        import uvloop
+    except ImportError:
+        main_logger.info("uvloop не установлен, используется стандартный цикл событий asyncio")
+        return
+    
+    # Политика глобальная: asyncio.run в потоках парсеров тоже создает цикл uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    main_logger.info("Используется цикл событий uvloop")
+
 def collect_data_from_sources() -> List[Dict[str, Any]]:
     """
     Сбор данных из всех источников
@@ -39,11 +55,19 @@ def collect_data_from_sources() -> List[Dict[str, Any]]:
     
     main_logger.info("Начинаем сбор данных из источников")
     
+    # РРАР и marketing-tech независимы: парсим их параллельно в потоках (ожидание HTTP отпускает GIL),
+    # а результаты обрабатываем в прежнем порядке
+    rrar_scraper = RRARScraper()
+    marketing_scraper = MarketingTechScraper()
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        main_logger.info("Сбор данных из РРАР и marketing-tech...")
+        rrar_future = executor.submit(rrar_scraper.scrape_all)
+        marketing_future = executor.submit(marketing_scraper.scrape_all)
+    
     # 1. Парсинг РРАР рейтингов
     try:
-        main_logger.info("Сбор данных из РРАР...")
-        rrar_scraper = RRARScraper()
-        rrar_companies = rrar_scraper.scrape_all()
+        rrar_companies = rrar_future.result()
         
         if rrar_companies:
             rrar_scraper.save_raw_data(rrar_companies)
@@ -55,9 +79,7 @@ def collect_data_from_sources() -> List[Dict[str, Any]]:
     
     # 2. Парсинг marketing-tech.ru
     try:
-        main_logger.info("Сбор данных из marketing-tech...")
-        marketing_scraper = MarketingTechScraper()
-        marketing_companies = marketing_scraper.scrape_all()
+        marketing_companies = marketing_future.result()
         
         if marketing_companies:
             marketing_scraper.save_raw_data(marketing_companies)
@@ -107,22 +129,42 @@ def merge_fns_data(companies: List[Dict[str, Any]], fns_data: List[Dict[str, Any
     Returns:
         Обогащенный список компаний
     """
-    # Создаем индекс по ИНН для быстрого поиска
-    fns_index = {item['inn']: item for item in fns_data if item.get('inn')}
-    
-    for company in companies:
-        inn = company.get('inn')
-        if inn and inn in fns_index:
-            fns_record = fns_index[inn]
-            
+    if not companies or not fns_data:
+        return companies
+    
+    # object-колонки сохраняют исходные значения (без приведения int -> float);
+    # индекс по ИНН: при повторах берется последняя запись ФНС
+    fns_df = pd.DataFrame(fns_data, dtype=object)
+    if 'inn' not in fns_df.columns:
+        return companies
+    fns_df = fns_df[fns_df['inn'].notna() & fns_df['inn'].astype(bool)].drop_duplicates('inn', keep='last')
+    
+    companies_df = pd.DataFrame(companies, dtype=object)
+    if 'inn' not in companies_df.columns:
+        return companies
+    
+    # Одно хеш-соединение вместо поиска по словарю для каждой компании
+    merged = companies_df.merge(fns_df, on='inn', how='left', suffixes=('', '_fns'), indicator=True)
+    matched = (merged['_merge'] == 'both').to_numpy()
+    if not matched.any():
+        return companies
+    
+    fns_columns = [col for col in fns_df.columns if col != 'inn']
+    for col in fns_columns:
+        if col in companies_df.columns:
             # Обогащаем данные, не перезаписывая существующие
-            for key, value in fns_record.items():
-                if key not in company or not company[key]:
-                    company[key] = value
+            current = merged[col]
+            empty = current.isna() | ~current.astype(bool)
+            merged[col] = current.where(~(empty & matched), merged[f'{col}_fns'])
+    
+    # Отсутствующие в записи ФНС поля (NaN после соединения) не переносятся
+    enriched = merged.loc[matched, fns_columns].to_dict('records')
+    for i, values in zip(np.flatnonzero(matched).tolist(), enriched):
+        companies[i].update({key: value for key, value in values.items() if value is None or value == value})
     
     return companies
 
-def process_data(companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def process_data(companies: List[Dict[str, Any]]) -> pd.DataFrame:
     """
     Обработка и очистка данных
     
@@ -130,80 +172,78 @@ def process_data(companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         companies: Сырые данные компаний
         
     Returns:
-        Обработанные данные компаний
+        DataFrame обработанных компаний
     """
     main_logger.info("Начинаем обработку данных")
     
-    # 1. Очистка данных
+    # 1. Очистка данных: дальше все этапы работают с одним DataFrame,
+    # без промежуточных списков словарей
     cleaner = DataCleaner()
-    cleaned_companies = cleaner.clean_companies_data(companies)
+    cleaned_df = cleaner.clean_companies_df(companies)
     
-    if cleaned_companies:
-        cleaner.save_cleaned_data(cleaned_companies)
+    if len(cleaned_df):
+        cleaner.save_cleaned_df(cleaned_df)
     
     # 2. Фильтрация по релевантности
-    relevant_companies = cleaner.filter_by_relevance(cleaned_companies)
+    relevant_df = cleaned_df[cleaner.relevance_mask(cleaned_df)]
+    main_logger.info(f"Отфильтровано {len(relevant_df)} релевантных компаний из {len(cleaned_df)}")
     
-    # 3. Удаление дубликатов
+    # 3. Удаление дубликатов: строки с уникальным ИНН остаются в DataFrame
     dedup_handler = DuplicateHandler()
-    unique_companies = dedup_handler.remove_duplicates(relevant_companies)
+    unique_df = dedup_handler.remove_duplicates_df(relevant_df)
     
-    if unique_companies:
-        dedup_handler.save_deduplicated_data(unique_companies)
+    if len(unique_df):
+        dedup_handler.save_deduplicated_df(unique_df)
     
     # 4. Финальная фильтрация по выручке
-    final_companies = filter_by_revenue(unique_companies)
+    final_companies = filter_by_revenue(unique_df)
     
     # Статистика обработки
-    stats = dedup_handler.get_duplicate_statistics(len(relevant_companies), len(unique_companies))
+    stats = dedup_handler.get_duplicate_statistics(len(relevant_df), len(unique_df))
     main_logger.info(f"Статистика дедупликации: {stats}")
     
     main_logger.info(f"Финальное количество компаний: {len(final_companies)}")
     
     return final_companies
 
-def filter_by_revenue(companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def filter_by_revenue(companies: pd.DataFrame) -> pd.DataFrame:
     """
     Фильтрация компаний по минимальной выручке
     
     Args:
-        companies: Список компаний
+        companies: DataFrame компаний
         
     Returns:
-        Отфильтрованный список компаний
+        Отфильтрованный DataFrame
     """
     min_revenue = config.min_revenue
-    filtered = []
     
-    for company in companies:
-        revenue = company.get('revenue', 0)
-        
-        # Пропускаем компании с нулевой выручкой (данные могут быть неполными)
-        # или с выручкой выше порога
-        if revenue == 0 or revenue >= min_revenue:
-            filtered.append(company)
+    if 'revenue' in companies.columns:
+        revenue = companies['revenue'].fillna(0).to_numpy(dtype=np.float64)
+    else:
+        revenue = np.zeros(len(companies))
+    
+    # Пропускаем компании с нулевой выручкой (данные могут быть неполными)
+    # или с выручкой выше порога - одна векторная маска по колонке
+    mask = (revenue == 0) | (revenue >= min_revenue)
+    filtered = companies[mask].reset_index(drop=True)
     
     main_logger.info(f"После фильтрации по выручке ≥{min_revenue:,}: {len(filtered)} компаний")
     
     return filtered
 
-def generate_final_csv(companies: List[Dict[str, Any]]) -> None:
+def generate_final_csv(df: pd.DataFrame) -> None:
     """
     Генерация финального CSV файла
     
     Args:
-        companies: Обработанные данные компаний
+        df: DataFrame обработанных компаний (результат filter_by_revenue)
     """
     try:
-        import pandas as pd
-        
-        if not companies:
+        if df.empty:
             main_logger.warning("Нет данных для создания CSV")
             return
         
-        # Создаем DataFrame
-        df = pd.DataFrame(companies)
-        
         # Обеспечиваем наличие всех обязательных колонок
         required_columns = [
             'inn', 'name', 'revenue_year', 'revenue', 'segment_tag', 'source'
@@ -215,16 +255,24 @@ def generate_final_csv(companies: List[Dict[str, Any]]) -> None:
         
         all_columns = required_columns + optional_columns
         
-        for col in all_columns:
-            if col not in df.columns:
-                df[col] = ''
+        # Недостающие колонки добавляются одним reindex
+        df = df.reindex(columns=all_columns, fill_value='')
+        
+        # Сортируем по выручке (по убыванию): числовая колонка сортируется
+        # без сравнения Python-объектов, даже если в данных были строки
+        df['revenue'] = pd.to_numeric(df['revenue'], errors='coerce').fillna(0).round().astype('int64')
+        df.sort_values('revenue', ascending=False, inplace=True, kind='stable')
         
-        # Сортируем по выручке (по убыванию)
-        df = df.sort_values('revenue', ascending=False)
+        # Узкие типы: сотрудники - nullable Int32, повторяющиеся строки - категории
+        # (меньше памяти и быстрее value_counts в print_statistics)
+        df['employees'] = pd.to_numeric(df['employees'], errors='coerce').astype('Int32')
+        category_columns = ['segment_tag', 'source', 'region']
+        df[category_columns] = df[category_columns].astype('category')
         
-        # Сохраняем финальный CSV
+        # Сохраняем финальный CSV потоково: строки переводятся в списки блоками
+        # и сразу уходят в csv.writer, полная копия данных не собирается
         output_file = config.output.get('csv_file', 'data/companies.csv')
-        df[all_columns].to_csv(output_file, index=False, encoding='utf-8')
+        write_csv_rows(iter_frame_rows(df), output_file, all_columns)
         
         main_logger.info(f"Финальный CSV сохранен: {output_file}")
         main_logger.info(f"Количество компаний в файле: {len(df)}")
@@ -264,29 +312,33 @@ def print_statistics(df) -> None:
     
     # Статистика по выручке
     if 'revenue' in df.columns:
-        revenue_stats = df[df['revenue'] > 0]['revenue']
-        if len(revenue_stats) > 0:
-            print(f"\nСтатистика по выручке ({len(revenue_stats)} компаний с данными):")
-            print(f"  Минимальная: {revenue_stats.min():,.0f} руб.")
-            print(f"  Максимальная: {revenue_stats.max():,.0f} руб.")
-            print(f"  Средняя: {revenue_stats.mean():,.0f} руб.")
-            print(f"  Медианная: {revenue_stats.median():,.0f} руб.")
+        revenue = df['revenue']
+        positive_revenue = revenue[revenue > 0]
+        if len(positive_revenue) > 0:
+            # Все четыре показателя одним agg по уже отобранной колонке
+            revenue_stats = positive_revenue.agg(['min', 'max', 'mean', 'median'])
+            print(f"\nСтатистика по выручке ({len(positive_revenue)} компаний с данными):")
+            print(f"  Минимальная: {revenue_stats['min']:,.0f} руб.")
+            print(f"  Максимальная: {revenue_stats['max']:,.0f} руб.")
+            print(f"  Средняя: {revenue_stats['mean']:,.0f} руб.")
+            print(f"  Медианная: {revenue_stats['median']:,.0f} руб.")
     
     # Статистика по регионам
     if 'region' in df.columns:
-        region_stats = df[df['region'] != '']['region'].value_counts().head(5)
+        region_stats = df['region'].value_counts().drop('', errors='ignore').head(5)
         if len(region_stats) > 0:
             print("\nТоп-5 регионов:")
             for region, count in region_stats.items():
                 print(f"  {region}: {count}")
     
     # Полнота данных
+    # Заполненность всех колонок считается одним сравнением по блоку колонок
     print(f"\nПолнота данных:")
-    for col in ['inn', 'revenue', 'site', 'contacts', 'okved_main']:
-        if col in df.columns:
-            filled = len(df[df[col] != ''])
-            percentage = (filled / len(df)) * 100
-            print(f"  {col}: {filled}/{len(df)} ({percentage:.1f}%)")
+    fill_columns = [col for col in ['inn', 'revenue', 'site', 'contacts', 'okved_main'] if col in df.columns]
+    filled_counts = (df[fill_columns] != '').sum()
+    for col, filled in filled_counts.items():
+        percentage = (filled / len(df)) * 100
+        print(f"  {col}: {filled}/{len(df)} ({percentage:.1f}%)")
     
     print("="*60 + "\n")
 
@@ -300,6 +352,7 @@ def main():
     try:
         # Настройка окружения
         setup_directories()
+        setup_event_loop()
         
         # Сбор данных
         companies = collect_data_from_sources()
@@ -311,7 +364,7 @@ def main():
         # Обработка данных
         processed_companies = process_data(companies)
         
-        if not processed_companies:
+        if processed_companies.empty:
             main_logger.error("Не получено обработанных данных")
             return
         
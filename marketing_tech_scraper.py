@@ -1,95 +1,334 @@
 """
 Парсер данных с marketing-tech.ru
 """
-import json
+import asyncio
 import re
-from typing import List, Dict, Any, Optional
-from urllib.parse import urljoin
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urljoin, urlsplit
+import aiohttp
 from bs4 import BeautifulSoup
 
-from ..utils import main_logger, safe_request, clean_text, normalize_company_name, parse_revenue
+from ..utils import (
+    main_logger, safe_request, clean_text, normalize_company_name, parse_revenue,
+    parse_retry_after, get_random_user_agent, write_json, RateLimiter
+)
 from config import SEGMENT_TAGS
 
+# Категории рейтинга: путь, ключ SEGMENT_TAGS, название для логов
+_CATEGORIES = {
+    'btl': ("company_tags/btl/", "BTL", "BTL агентств marketing-tech"),
+    'marketing': ("company_tags/marketing/", "FULL_CYCLE", "маркетинговых агентств"),
+    'advertising': ("company_tags/advertising/", "FULL_CYCLE", "рекламных агентств")
+}
+
+# Параметры асинхронной загрузки страниц
+_CONNECTIONS_LIMIT = 64
+_CONNECTIONS_PER_HOST = 8
+_KEEPALIVE_TIMEOUT = 30
+_REQUEST_TIMEOUT = 30
+_MAX_RETRIES = 3
+_MAX_CONCURRENT_DETAILS = 8
+
+# Общий лимит скорости загрузки детальных страниц (запросов за период в секундах):
+# категории парсятся параллельно, поэтому одних лимитов соединений недостаточно
+_DETAIL_RATE_LIMIT = (2, 1.0)
+_DETAIL_LIMITER = RateLimiter(*_DETAIL_RATE_LIMIT)
+
+# Регулярные выражения разбора страниц компилируются один раз при импорте
+_TABLE_CLS_RE = re.compile(r'table|rating')
+_DESC_CLS_RE = re.compile(r'desc|about|info|content')
+_DETAIL_DESC_CLS_RE = re.compile(r'desc|about|info')
+_NAME_CLS_RE = re.compile(r'name|title')
+_HTTP_RE = re.compile(r'^https?://')
+# Телефон и email ищутся одним проходом по тексту страницы (именованные группы)
+_CONTACT_RE = re.compile(
+    r'(?P<phone>\+7[\s\-\(\)]?\d{3}[\s\-\(\)]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2})'
+    r'|(?P<email>\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b)'
+)
+_EMPLOYEES_RE = re.compile(r'(\d+)\s*сотрудник|(\d+)\s*человек|штат[:\s]*(\d+)', re.IGNORECASE)
+
+# Города для определения региона (в порядке приоритета)
+_LOCATION_KEYWORDS = ('москва', 'спб', 'санкт-петербург', 'екатеринбург', 'новосибирск', 'казань')
+_LOCATION_RE = re.compile('|'.join(map(re.escape, _LOCATION_KEYWORDS)))
+
+# Сервисные сайты, которые не считаются сайтом компании (одна регулярка на все домены)
+_EXCLUDED_DOMAINS = frozenset({
+    'marketing-tech.ru',
+    'google.com',
+    'yandex.ru',
+    'facebook.com',
+    'vk.com',
+    'instagram.com',
+    'linkedin.com',
+    'youtube.com'
+})
+_EXCLUDED_DOMAINS_RE = re.compile('|'.join(map(re.escape, sorted(_EXCLUDED_DOMAINS))), re.IGNORECASE)
+
+# LRU-кэш HTML детальных страниц: одна компания встречается в нескольких категориях
+_DETAIL_CACHE_SIZE = 2048
+
+def _find_contacts(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Поиск телефона и email за один проход по тексту
+    
+    Args:
+        text: Текст страницы
+        
+    Returns:
+        (первый телефон, первый email до него); после телефона поиск останавливается
+    """
+    email = None
+    for match in _CONTACT_RE.finditer(text):
+        if match.lastgroup == 'phone':
+            return match.group().strip(), email
+        if email is None:
+            email = match.group()
+    return None, email
+
 class MarketingTechScraper:
     """Парсер сайта marketing-tech.ru для получения данных о маркетинговых агентствах"""
     
     def __init__(self, base_url: str = "https://marketing-tech.ru/"):
         self.base_url = base_url
         self.logger = main_logger
+        self._headers = {'User-Agent': get_random_user_agent()}
         
-    def scrape_btl_agencies(self) -> List[Dict[str, Any]]:
-        """Парсинг BTL агентств с данными о выручке"""
-        agencies = []
+        # Детальные страницы загружаются только с сайта рейтинга
+        self._base_host = urlsplit(base_url).netloc.removeprefix('www.')
         
-        try:
-            url = urljoin(self.base_url, "company_tags/btl/")
-            self.logger.info(f"Парсинг BTL агентств marketing-tech: {url}")
+        # Кэш детальных страниц по URL и загрузки, которые уже идут
+        self._detail_cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._detail_inflight: Dict[str, asyncio.Future] = {}
+        self._detail_hits = 0
+        self._detail_misses = 0
+    
+    def _run(self, coro_fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """
+        Синхронный запуск корутины парсера в отдельной сессии aiohttp
+        
+        Args:
+            coro_fn: Корутина, первым аргументом принимающая сессию
+            *args: Остальные аргументы корутины
             
-            response = safe_request(url)
-            if not response:
-                return agencies
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
+        Returns:
+            Результат корутины
+        """
+        async def runner() -> Any:
+            connector = aiohttp.TCPConnector(
+                limit=_CONNECTIONS_LIMIT,
+                limit_per_host=_CONNECTIONS_PER_HOST,
+                keepalive_timeout=_KEEPALIVE_TIMEOUT
+            )
+            timeout = aiohttp.ClientTimeout(total=_REQUEST_TIMEOUT)
+            
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self._headers) as session:
+                return await coro_fn(session, *args)
+        
+        return asyncio.run(runner())
+    
+    async def _fetch_html_async(self, session: aiohttp.ClientSession, url: str) -> Optional[bytes]:
+        """
+        Загрузка страницы с повторами: экспоненциальная пауза, на 429/5xx - по Retry-After
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            url: URL страницы
             
-            # Ищем таблицу с рейтингом
-            companies = self._extract_companies_from_table(soup, SEGMENT_TAGS["BTL"])
-            agencies.extend(companies)
+        Returns:
+            HTML страницы (байты: кодировку определяет lxml) или None
+        """
+        for attempt in range(_MAX_RETRIES):
+            wait_time = 2 ** attempt
+            
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return await response.read()
+                    
+                    if response.status != 429 and response.status < 500:
+                        self.logger.warning(f"Ошибка запроса {url}: HTTP {response.status}")
+                        return None
+                    
+                    retry_after = parse_retry_after(response.headers)
+                    if retry_after is not None:
+                        wait_time = retry_after
+                    
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == _MAX_RETRIES - 1:
+                    self.logger.error(f"Ошибка запроса {url}: {e}")
+                    return None
             
-            self.logger.info(f"Найдено BTL агентств в marketing-tech: {len(companies)}")
+            if attempt < _MAX_RETRIES - 1:
+                await asyncio.sleep(wait_time)
+        
+        self.logger.error(f"Ошибка запроса {url}: попытки исчерпаны")
+        return None
+    
+    def _detail_cache_get(self, key: str) -> Optional[bytes]:
+        """
+        HTML детальной страницы из LRU-кэша
+        
+        Args:
+            key: Нормализованный URL
             
-        except Exception as e:
-            self.logger.error(f"Ошибка парсинга BTL агентств marketing-tech: {e}")
+        Returns:
+            HTML или None при промахе
+        """
+        html = self._detail_cache.get(key)
+        if html is None:
+            return None
+        
+        self._detail_cache.move_to_end(key)
+        self._detail_hits += 1
+        return html
+    
+    def _detail_cache_put(self, key: str, html: bytes) -> None:
+        """
+        Сохранение HTML детальной страницы с вытеснением самой старой записи
+        
+        Args:
+            key: Нормализованный URL
+            html: HTML страницы
+        """
+        self._detail_cache[key] = html
+        self._detail_cache.move_to_end(key)
+        if len(self._detail_cache) > _DETAIL_CACHE_SIZE:
+            self._detail_cache.popitem(last=False)
+    
+    async def _fetch_detail_html_async(self, session: aiohttp.ClientSession, url: str) -> Optional[bytes]:
+        """
+        Загрузка детальной страницы через кэш; параллельные запросы одного URL объединяются
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            url: URL детальной страницы
             
-        return agencies
+        Returns:
+            HTML страницы или None
+        """
+        key = urldefrag(url)[0]
+        
+        html = self._detail_cache_get(key)
+        if html is not None:
+            return html
+        
+        inflight = self._detail_inflight.get(key)
+        if inflight is not None:
+            self._detail_hits += 1
+            return await inflight
+        
+        self._detail_misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._detail_inflight[key] = future
+        
+        try:
+            async with _DETAIL_LIMITER:
+                html = await self._fetch_html_async(session, url)
+            if html is not None:
+                self._detail_cache_put(key, html)
+        finally:
+            del self._detail_inflight[key]
+            future.set_result(html)
+        
+        return html
     
-    def scrape_marketing_agencies(self) -> List[Dict[str, Any]]:
-        """Парсинг маркетинговых агентств"""
+    def _fetch_detail_html(self, url: str) -> Optional[bytes]:
+        """
+        Синхронная загрузка детальной страницы через тот же кэш
+        
+        Args:
+            url: URL детальной страницы
+            
+        Returns:
+            HTML страницы или None
+        """
+        key = urldefrag(url)[0]
+        
+        html = self._detail_cache_get(key)
+        if html is not None:
+            return html
+        
+        self._detail_misses += 1
+        response = safe_request(url, delay=2)
+        if not response:
+            return None
+        
+        self._detail_cache_put(key, response.content)
+        return response.content
+    
+    def cache_info(self) -> Dict[str, int]:
+        """
+        Статистика кэша детальных страниц
+        
+        Returns:
+            Попадания, промахи и текущий размер кэша
+        """
+        return {
+            'hits': self._detail_hits,
+            'misses': self._detail_misses,
+            'size': len(self._detail_cache),
+            'maxsize': _DETAIL_CACHE_SIZE
+        }
+    
+    async def scrape_category_async(self, session: aiohttp.ClientSession, category: str) -> List[Dict[str, Any]]:
+        """
+        Парсинг одной категории рейтинга с параллельным обогащением компаний
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            category: Ключ категории из _CATEGORIES ('btl', 'marketing', 'advertising')
+            
+        Returns:
+            Список компаний категории
+        """
+        path, segment_key, label = _CATEGORIES[category]
         agencies = []
         
         try:
-            url = urljoin(self.base_url, "company_tags/marketing/")
-            self.logger.info(f"Парсинг маркетинговых агентств: {url}")
+            url = urljoin(self.base_url, path)
+            self.logger.info(f"Парсинг {label}: {url}")
             
-            response = safe_request(url)
-            if not response:
+            html = await self._fetch_html_async(session, url)
+            if not html:
                 return agencies
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
             
-            companies = self._extract_companies_from_table(soup, SEGMENT_TAGS["FULL_CYCLE"])
-            agencies.extend(companies)
+            soup = BeautifulSoup(html, 'lxml')
             
-            self.logger.info(f"Найдено маркетинговых агентств: {len(companies)}")
+            # Ищем таблицу с рейтингом
+            companies = self._extract_companies_from_table(soup, SEGMENT_TAGS[segment_key])
             
-        except Exception as e:
-            self.logger.error(f"Ошибка парсинга маркетинговых агентств: {e}")
+            # Детальные страницы загружаются параллельно, не больше _MAX_CONCURRENT_DETAILS сразу
+            semaphore = asyncio.Semaphore(_MAX_CONCURRENT_DETAILS)
             
-        return agencies
-    
-    def scrape_advertising_agencies(self) -> List[Dict[str, Any]]:
-        """Парсинг рекламных агентств"""
-        agencies = []
-        
-        try:
-            url = urljoin(self.base_url, "company_tags/advertising/")
-            self.logger.info(f"Парсинг рекламных агентств: {url}")
+            async def enrich(company_data: Dict[str, Any]) -> None:
+                async with semaphore:
+                    await self._enrich_company_data_async(session, company_data, company_data['rating_ref'])
             
-            response = safe_request(url)
-            if not response:
-                return agencies
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
+            await asyncio.gather(*(enrich(company) for company in companies if self._needs_enrichment(company)))
             
-            companies = self._extract_companies_from_table(soup, SEGMENT_TAGS["FULL_CYCLE"])
             agencies.extend(companies)
             
-            self.logger.info(f"Найдено рекламных агентств: {len(companies)}")
+            self.logger.info(f"Найдено {label}: {len(companies)}")
             
         except Exception as e:
-            self.logger.error(f"Ошибка парсинга рекламных агентств: {e}")
+            self.logger.error(f"Ошибка парсинга {label}: {e}")
             
         return agencies
     
+    def scrape_btl_agencies(self) -> List[Dict[str, Any]]:
+        """Парсинг BTL агентств с данными о выручке"""
+        return self._run(self.scrape_category_async, 'btl')
+    
+    def scrape_marketing_agencies(self) -> List[Dict[str, Any]]:
+        """Парсинг маркетинговых агентств"""
+        return self._run(self.scrape_category_async, 'marketing')
+    
+    def scrape_advertising_agencies(self) -> List[Dict[str, Any]]:
+        """Парсинг рекламных агентств"""
+        return self._run(self.scrape_category_async, 'advertising')
+    
+
     def _extract_companies_from_table(self, soup: BeautifulSoup, segment_tag: str) -> List[Dict[str, Any]]:
         """
         Извлечение компаний из таблицы рейтинга
@@ -105,7 +344,7 @@ class MarketingTechScraper:
         
         try:
             # Ищем таблицу с рейтингом
-            table = soup.find('table') or soup.find('div', class_=re.compile(r'table|rating'))
+            table = soup.find('table') or soup.find('div', class_=_TABLE_CLS_RE)
             
             if not table:
                 self.logger.warning("Таблица рейтинга не найдена")
@@ -181,33 +420,53 @@ class MarketingTechScraper:
                 'region': ''
             }
             
-            # Пытаемся получить дополнительную информацию с детальной страницы
-            if detail_url:
-                self._enrich_company_data(company_data, detail_url)
-            
+            # Дополнительная информация с детальной страницы (rating_ref)
+            # загружается отдельно, параллельно для всех строк таблицы
             return company_data
             
         except Exception as e:
             self.logger.error(f"Ошибка извлечения компании из строки: {e}")
             return None
     
-    def _enrich_company_data(self, company_data: Dict[str, Any], detail_url: str) -> None:
+    def _needs_enrichment(self, company_data: Dict[str, Any]) -> bool:
+        """
+        Проверка, стоит ли загружать детальную страницу компании
+        
+        Args:
+            company_data: Данные компании из таблицы
+            
+        Returns:
+            True если ссылка ведет на сайт рейтинга и данные из таблицы неполные
+        """
+        detail_url = company_data['rating_ref']
+        if not detail_url or urlsplit(detail_url).netloc.removeprefix('www.') != self._base_host:
+            return False
+        
+        return not (company_data['description'] and company_data['site'] and company_data['contacts'])
+    
+    async def _enrich_company_data_async(
+        self,
+        session: aiohttp.ClientSession,
+        company_data: Dict[str, Any],
+        detail_url: str
+    ) -> None:
         """
         Обогащение данных компании с детальной страницы
         
         Args:
+            session: HTTP-сессия aiohttp
             company_data: Данные компании для обогащения
             detail_url: URL детальной страницы
         """
         try:
-            response = safe_request(detail_url, delay=2)
-            if not response:
+            html = await self._fetch_detail_html_async(session, detail_url)
+            if not html:
                 return
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(html, 'lxml')
             
             # Ищем описание компании
-            desc_sections = soup.find_all(['div'], class_=re.compile(r'desc|about|info|content'))
+            desc_sections = soup.find_all(['div'], class_=_DESC_CLS_RE)
             if desc_sections:
                 descriptions = []
                 for section in desc_sections:
@@ -218,35 +477,31 @@ class MarketingTechScraper:
                 if descriptions:
                     company_data['description'] = descriptions[0][:200]
             
-            # Ищем контактную информацию
-            contact_text = soup.get_text()
-            
-            # Телефон
-            phone_match = re.search(r'\+7[\s\-\(\)]?\d{3}[\s\-\(\)]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}', contact_text)
-            if phone_match:
-                company_data['contacts'] = phone_match.group().strip()
+            # Текст страницы извлекается один раз: для контактов и для поиска региона
+            page_text = soup.get_text()
+            page_text_lower = page_text.lower()
             
-            # Email
-            email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', contact_text)
-            if email_match and not company_data['contacts']:
-                company_data['contacts'] = email_match.group()
+            # Телефон, иначе email
+            phone, email = _find_contacts(page_text)
+            if phone:
+                company_data['contacts'] = phone
+            elif email and not company_data['contacts']:
+                company_data['contacts'] = email
             
             # Сайт компании
-            site_links = soup.find_all('a', href=re.compile(r'^https?://'))
+            site_links = soup.find_all('a', href=_HTTP_RE)
             for link in site_links:
                 href = link.get('href', '')
                 if self._is_company_website(href):
                     company_data['site'] = href
                     break
             
-            # Город/регион
-            location_keywords = ['москва', 'спб', 'санкт-петербург', 'екатеринбург', 'новосибирск', 'казань']
-            page_text = soup.get_text().lower()
-            
-            for keyword in location_keywords:
-                if keyword in page_text:
-                    company_data['region'] = keyword.title()
-                    break
+            # Город/регион: все города находятся за один проход по тексту,
+            # выбирается первый по приоритету _LOCATION_KEYWORDS
+            found_locations = set(_LOCATION_RE.findall(page_text_lower))
+            location = next((keyword for keyword in _LOCATION_KEYWORDS if keyword in found_locations), None)
+            if location:
+                company_data['region'] = location.title()
                     
         except Exception as e:
             self.logger.error(f"Ошибка обогащения данных компании {detail_url}: {e}")
@@ -265,19 +520,7 @@ class MarketingTechScraper:
             return False
         
         # Исключаем сервисные сайты
-        excluded_domains = [
-            'marketing-tech.ru',
-            'google.com',
-            'yandex.ru',
-            'facebook.com',
-            'vk.com',
-            'instagram.com',
-            'linkedin.com',
-            'youtube.com'
-        ]
-        
-        url_lower = url.lower()
-        return not any(domain in url_lower for domain in excluded_domains)
+        return _EXCLUDED_DOMAINS_RE.search(url) is None
     
     def scrape_all(self) -> List[Dict[str, Any]]:
         """
@@ -286,23 +529,25 @@ class MarketingTechScraper:
         Returns:
             Список всех компаний
         """
-        all_companies = []
+        return self._run(self.scrape_all_async)
+    
+    async def scrape_all_async(self, session: aiohttp.ClientSession) -> List[Dict[str, Any]]:
+        """
+        Асинхронный парсинг всех категорий marketing-tech: категории загружаются параллельно
         
+        Args:
+            session: HTTP-сессия aiohttp
+            
+        Returns:
+            Список всех компаний (в порядке: BTL, маркетинговые, рекламные)
+        """
         self.logger.info("Начинаем парсинг marketing-tech.ru")
         
-        # BTL агентства
-        btl_companies = self.scrape_btl_agencies()
-        all_companies.extend(btl_companies)
-        
-        # Маркетинговые агентства
-        marketing_companies = self.scrape_marketing_agencies()
-        all_companies.extend(marketing_companies)
-        
-        # Рекламные агентства
-        advertising_companies = self.scrape_advertising_agencies()
-        all_companies.extend(advertising_companies)
+        results = await asyncio.gather(*(self.scrape_category_async(session, category) for category in _CATEGORIES))
+        all_companies = [company for companies in results for company in companies]
         
         self.logger.info(f"Всего получено компаний из marketing-tech: {len(all_companies)}")
+        self.logger.info(f"Кэш детальных страниц: {self.cache_info()}")
         
         return all_companies
     
@@ -315,8 +560,7 @@ class MarketingTechScraper:
             filename: Имя файла для сохранения
         """
         try:
-            with open(f"data/raw/{filename}", 'w', encoding='utf-8') as f:
-                json.dump(companies, f, ensure_ascii=False, indent=2)
+            write_json(companies, f"data/raw/{filename}")
             
             self.logger.info(f"Сырые данные marketing-tech сохранены в {filename}")
             
@@ -336,26 +580,26 @@ class MarketingTechScraper:
         company_details = {}
         
         try:
-            response = safe_request(company_url, delay=2)
-            if not response:
+            html = self._fetch_detail_html(company_url)
+            if not html:
                 return company_details
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(html, 'lxml')
             
             # Извлекаем различные поля
             
             # Название
-            name_element = soup.find('h1') or soup.find(['h2', 'h3'], class_=re.compile(r'name|title'))
+            name_element = soup.find('h1') or soup.find(['h2', 'h3'], class_=_NAME_CLS_RE)
             if name_element:
                 company_details['name'] = clean_text(name_element.get_text())
             
             # Описание
-            desc_element = soup.find(['div'], class_=re.compile(r'desc|about|info'))
+            desc_element = soup.find(['div'], class_=_DETAIL_DESC_CLS_RE)
             if desc_element:
                 company_details['description'] = clean_text(desc_element.get_text())[:200]
             
             # Сайт
-            site_element = soup.find('a', href=re.compile(r'^https?://'))
+            site_element = soup.find('a', href=_HTTP_RE)
             if site_element:
                 href = site_element.get('href')
                 if self._is_company_website(href):
@@ -363,7 +607,7 @@ class MarketingTechScraper:
             
             # Количество сотрудников
             employees_text = soup.get_text()
-            employees_match = re.search(r'(\d+)\s*сотрудник|(\d+)\s*человек|штат[:\s]*(\d+)', employees_text, re.IGNORECASE)
+            employees_match = _EMPLOYEES_RE.search(employees_text)
             if employees_match:
                 employees = employees_match.group(1) or employees_match.group(2) or employees_match.group(3)
                 company_details['employees'] = int(employees)
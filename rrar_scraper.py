@@ -1,145 +1,367 @@
 """
 Парсер рейтингов РРАР (AllAdvertising.ru)
 """
-import json
+import asyncio
+import base64
 import re
-from typing import List, Dict, Any, Optional
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from html import unescape
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse, urlsplit
+import aiohttp
+import lxml.html
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+from soupsieve import compile as css_compile
 
-from ..utils import main_logger, safe_request, clean_text, normalize_company_name
+from ..utils import (
+    main_logger, clean_text, normalize_company_name, parse_retry_after,
+    get_random_user_agent, write_json, RateLimiter, FileCache
+)
 from config import SEGMENT_TAGS
 
+# Категории рейтинга: путь, ключ SEGMENT_TAGS, название для логов
+_CATEGORIES = {
+    'btl': ("top/btl/", "BTL", "BTL агентств"),
+    'souvenir': ("top/gifts/", "SOUVENIR", "сувенирных компаний"),
+    'event': ("top/event/", "EVENT", "ивент-агентств"),
+    'top100': ("top100/", "FULL_CYCLE", "агентств полного цикла")
+}
+
+# Параметры асинхронной загрузки страниц
+_CONNECTIONS_LIMIT = 20
+_CONNECTIONS_PER_HOST = 8
+_KEEPALIVE_TIMEOUT = 30
+_REQUEST_TIMEOUT = 30
+_MAX_RETRIES = 3
+_MAX_CONCURRENT_DETAILS = 8
+
+# Валидаторы ETag/Last-Modified и тело страницы по URL для условных запросов (секунды)
+_CACHE_TTLS = {'rrar': 30 * 86400}
+
+# Регулярные выражения разбора страниц компилируются один раз при импорте
+_COMPANY_BLOCK_RE = re.compile(r'company|item|card')
+_INFO_LINK_RE = re.compile(r'/info/')
+_HTTP_RE = re.compile(r'^https?://')
+
+# CSS-селекторы блока компании, также компилируются один раз
+_NAME_SEL = css_compile('h2, h3, h4, a')
+_DESC_SEL = css_compile('p, div[class*="desc"], div[class*="content"], div[class*="text"]')
+_LINK_SEL = css_compile('a[href]')
+
+# Контакты ищутся прямо в байтах ответа, без построения текста страницы;
+# имена файлов вида logo@2x.png в разметке за email не считаются.
+# Разделителем в телефоне может быть и неразрывный пробел: &nbsp;/&#160;,
+# \xc2\xa0 в UTF-8 или \xa0 в windows-1251 (после цифры это не часть символа UTF-8)
+_NBSP = rb'&nbsp;|&#160;|\xc2\xa0|\xa0'
+_PHONE_SEP = rb'(?:[\s\-()]|' + _NBSP + rb')?'
+_PHONE_DASH_SEP = rb'(?:[\s\-]|' + _NBSP + rb')?'
+_PHONE_RE = re.compile(
+    rb'\+7' + _PHONE_SEP + rb'\d{3}' + _PHONE_SEP + rb'\d{3}'
+    + _PHONE_DASH_SEP + rb'\d{2}' + _PHONE_DASH_SEP + rb'\d{2}'
+)
+_EMAIL_RE = re.compile(rb'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.(?!(?:png|jpe?g|gif|svg|webp)\b)[A-Za-z]{2,}\b')
+
+# Страница рейтинга: в дерево попадают только блоки компаний и ссылки (с содержимым)
+_PAGE_STRAINER = SoupStrainer(['div', 'article', 'a'])
+
+# Общий лимит скорости загрузки детальных страниц (запросов за период в секундах)
+_DETAIL_RATE_LIMIT = (2, 1.0)
+_DETAIL_LIMITER = RateLimiter(*_DETAIL_RATE_LIMIT)
+
+def _decode_phone(raw: bytes) -> str:
+    """
+    Телефон из найденных байтов в том виде, в каком его дал бы текст страницы
+    
+    Args:
+        raw: Совпадение _PHONE_RE
+        
+    Returns:
+        Телефон; неразрывные пробелы в любой записи - символ \xa0
+    """
+    return unescape(raw.replace(b'\xc2\xa0', b'\xa0').decode('latin-1'))
+
+def _is_external_site(href: Optional[str]) -> bool:
+    """
+    Проверка, ведет ли ссылка на внешний сайт (не на alladvertising)
+    
+    Args:
+        href: Значение атрибута href
+        
+    Returns:
+        True если это абсолютная http(s)-ссылка на другой домен
+    """
+    if not href or not _HTTP_RE.match(href):
+        return False
+    
+    domain = urlparse(href).netloc
+    return bool(domain) and 'alladvertising' not in domain
+
 class RRARScraper:
     """Парсер рейтингов РРАР для получения данных о BTL агентствах"""
     
-    def _init_(self, base_url: str = "https://www.alladvertising.ru/"):
+    def __init__(self, base_url: str = "https://www.alladvertising.ru/"):
         self.base_url = base_url
         self.logger = main_logger
+        self._headers = {'User-Agent': get_random_user_agent()}
         
-    def scrape_btl_agencies(self) -> List[Dict[str, Any]]:
-        """Парсинг BTL агентств из рейтинга РРАР"""
-        agencies = []
+        # URL и тег сегмента каждой категории вычисляются один раз
+        self._categories = {
+            category: (urljoin(base_url, path), SEGMENT_TAGS[segment_key], label)
+            for category, (path, segment_key, label) in _CATEGORIES.items()
+        }
         
-        try:
-            url = urljoin(self.base_url, "top/btl/")
-            self.logger.info(f"Парсинг BTL агентств: {url}")
+        # Схема и хост сайта для быстрого построения ссылок вида /info/...
+        parts = urlsplit(base_url)
+        self._origin = f"{parts.scheme}://{parts.netloc}"
+        
+        # Страницы рейтинга меняются редко: повторные запуски перепроверяют их по ETag
+        self.cache = FileCache(ttls=_CACHE_TTLS)
+        
+        # Данные детальных страниц по URL: одна компания встречается в нескольких
+        # категориях, страница загружается и разбирается один раз
+        self._enrich_cache: Dict[str, Dict[str, str]] = {}
+        self._enrich_inflight: Dict[str, asyncio.Future] = {}
+    
+    def _run(self, coro_fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """
+        Синхронный запуск корутины парсера в отдельной сессии aiohttp
+        
+        Args:
+            coro_fn: Корутина, первым аргументом принимающая сессию
+            *args: Остальные аргументы корутины
             
-            response = safe_request(url)
-            if not response:
-                return agencies
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
+        Returns:
+            Результат корутины
+        """
+        async def runner() -> Any:
+            connector = aiohttp.TCPConnector(
+                limit=_CONNECTIONS_LIMIT,
+                limit_per_host=_CONNECTIONS_PER_HOST,
+                keepalive_timeout=_KEEPALIVE_TIMEOUT
+            )
+            timeout = aiohttp.ClientTimeout(total=_REQUEST_TIMEOUT)
+            
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self._headers) as session:
+                return await coro_fn(session, *args)
+        
+        return asyncio.run(runner())
+    
+    def _conditional_headers(self, url: str) -> Tuple[Optional[Dict[str, str]], Optional[Dict[str, Any]]]:
+        """
+        Заголовки условного запроса по сохраненным валидаторам URL
+        
+        Args:
+            url: URL страницы
             
-            # Ищем компании в рейтинге
-            companies = self._extract_companies_from_page(soup, SEGMENT_TAGS["BTL"])
-            agencies.extend(companies)
+        Returns:
+            Дополнительные заголовки запроса (или None) и сохраненная запись (или None)
+        """
+        stored = self.cache.get(f"rrar:{url}")
+        if not stored:
+            return None, None
+        
+        headers = {}
+        if stored.get('etag'):
+            headers['If-None-Match'] = stored['etag']
+        if stored.get('last_modified'):
+            headers['If-Modified-Since'] = stored['last_modified']
+        return headers, stored
+    
+    def _remember_response(self, url: str, response_headers: Any, html: bytes) -> None:
+        """
+        Сохранение валидаторов ответа и тела страницы для следующих условных запросов
+        
+        Args:
+            url: URL страницы
+            response_headers: Заголовки ответа
+            html: Тело ответа
+        """
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if etag or last_modified:
+            body = base64.b64encode(html).decode('ascii')
+            self.cache.set(f"rrar:{url}", {'etag': etag, 'last_modified': last_modified, 'body': body})
+    
+    def _reuse_stored(self, url: str, stored: Dict[str, Any]) -> bytes:
+        """
+        Ответ 304: продлеваем срок сохраненной записи и возвращаем ее тело
+        
+        Args:
+            url: URL страницы
+            stored: Сохраненная запись
             
-            self.logger.info(f"Найдено BTL агентств: {len(companies)}")
+        Returns:
+            HTML страницы из кэша
+        """
+        self.cache.set(f"rrar:{url}", stored)
+        return base64.b64decode(stored['body'])
+    
+    async def _fetch_html_async(self, session: aiohttp.ClientSession, url: str) -> Optional[bytes]:
+        """
+        Загрузка страницы с повторами: экспоненциальная пауза, на 429/5xx - по Retry-After
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            url: URL страницы
             
-        except Exception as e:
-            self.logger.error(f"Ошибка парсинга BTL агентств: {e}")
+        Returns:
+            HTML страницы (байты: кодировку определяет парсер) или None
+        """
+        headers, stored = self._conditional_headers(url)
+        
+        for attempt in range(_MAX_RETRIES):
+            wait_time = 2 ** attempt
+            
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304 and stored:
+                        return self._reuse_stored(url, stored)
+                    
+                    if response.status == 200:
+                        html = await response.read()
+                        self._remember_response(url, response.headers, html)
+                        return html
+                    
+                    if response.status != 429 and response.status < 500:
+                        self.logger.warning(f"Ошибка запроса {url}: HTTP {response.status}")
+                        return None
+                    
+                    retry_after = parse_retry_after(response.headers)
+                    if retry_after is not None:
+                        wait_time = retry_after
+                    
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == _MAX_RETRIES - 1:
+                    self.logger.error(f"Ошибка запроса {url}: {e}")
+                    return None
+            
+            if attempt < _MAX_RETRIES - 1:
+                await asyncio.sleep(wait_time)
+        
+        self.logger.error(f"Ошибка запроса {url}: попытки исчерпаны")
+        return None
+    
+    async def scrape_category_async(self, session: aiohttp.ClientSession, category: str) -> List[Dict[str, Any]]:
+        """
+        Парсинг одной категории рейтинга с параллельным обогащением компаний
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            category: Ключ категории из _CATEGORIES ('btl', 'souvenir', 'event', 'top100')
             
-        return agencies
-      def scrape_souvenir_companies(self) -> List[Dict[str, Any]]:
-        """Парсинг компаний сувенирной продукции"""
-        companies = []
+        Returns:
+            Список компаний категории
+        """
+        url, segment_tag, label = self._categories[category]
+        agencies = []
         
         try:
-            url = urljoin(self.base_url, "top/gifts/")
-            self.logger.info(f"Парсинг сувенирных компаний: {url}")
+            self.logger.info(f"Парсинг {label}: {url}")
             
-            response = safe_request(url)
-            if not response:
-                return companies
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
+            html = await self._fetch_html_async(session, url)
+            if not html:
+                return agencies
+            
+            soup = BeautifulSoup(html, 'lxml', parse_only=_PAGE_STRAINER)
             
             # Ищем компании в рейтинге
-            found_companies = self._extract_companies_from_page(soup, SEGMENT_TAGS["SOUVENIR"])
-            companies.extend(found_companies)
+            companies, to_enrich = self._extract_companies_from_page(soup, segment_tag)
             
-            self.logger.info(f"Найдено сувенирных компаний: {len(found_companies)}")
+            # Детальные страницы загружаются параллельно, не больше _MAX_CONCURRENT_DETAILS сразу
+            semaphore = asyncio.Semaphore(_MAX_CONCURRENT_DETAILS)
             
-        except Exception as e:
-            self.logger.error(f"Ошибка парсинга сувенирных компаний: {e}")
+            async def enrich(company_data: Dict[str, Any]) -> None:
+                async with semaphore:
+                    await self._enrich_company_data_async(session, company_data, company_data['rating_ref'])
             
-        return companies
-    
-    def scrape_event_agencies(self) -> List[Dict[str, Any]]:
-        """Парсинг ивент-агентств"""
-        agencies = []
-        
-        try:
-            url = urljoin(self.base_url, "top/event/")
-            self.logger.info(f"Парсинг ивент-агентств: {url}")
+            await asyncio.gather(*(enrich(company) for company in to_enrich))
             
-            response = safe_request(url)
-            if not response:
-                return agencies
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
-          # Ищем компании в рейтинге  
-            companies = self._extract_companies_from_page(soup, SEGMENT_TAGS["EVENT"])
             agencies.extend(companies)
             
-            self.logger.info(f"Найдено ивент-агентств: {len(companies)}")
+            self.logger.info(f"Найдено {label}: {len(companies)}")
             
         except Exception as e:
-            self.logger.error(f"Ошибка парсинга ивент-агентств: {e}")
+            self.logger.error(f"Ошибка парсинга {label}: {e}")
             
         return agencies
     
+    def scrape_btl_agencies(self) -> List[Dict[str, Any]]:
+        """Парсинг BTL агентств из рейтинга РРАР"""
+        return self._run(self.scrape_category_async, 'btl')
+    
+    def scrape_souvenir_companies(self) -> List[Dict[str, Any]]:
+        """Парсинг компаний сувенирной продукции"""
+        return self._run(self.scrape_category_async, 'souvenir')
+    
+    def scrape_event_agencies(self) -> List[Dict[str, Any]]:
+        """Парсинг ивент-агентств"""
+        return self._run(self.scrape_category_async, 'event')
+    
     def scrape_top100_agencies(self) -> List[Dict[str, Any]]:
         """Парсинг ТОП-100 агентств (полный цикл)"""
-        agencies = []
+        return self._run(self.scrape_category_async, 'top100')
+    
+    def _absolute_url(self, href: str) -> str:
+        """
+        Абсолютный URL ссылки со страницы рейтинга
         
-        try:
-            url = urljoin(self.base_url, "top100/")
-            self.logger.info(f"Парсинг ТОП-100 агентств: {url}")
-            
-            response = safe_request(url)
-            if not response:
-                return agencies
-                
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Ищем компании в рейтинге
-            companies = self._extract_companies_from_page(soup, SEGMENT_TAGS["FULL_CYCLE"])
-            agencies.extend(companies)
-            
-            self.logger.info(f"Найдено агентств полного цикла: {len(companies)}")
-            
-        except Exception as e:
-            self.logger.error(f"Ошибка парсинга агентств полного цикла: {e}")
+        Args:
+            href: Значение атрибута href
             
-        return agencies
-      def _extract_companies_from_page(self, soup: BeautifulSoup, segment_tag: str) -> List[Dict[str, Any]]:
+        Returns:
+            Абсолютный URL
         """
-        Извлечение данных компаний со страницы рейтинга
+        # Частые случаи без разбора URL: абсолютная ссылка и путь от корня сайта
+        if _HTTP_RE.match(href):
+            return href
+        if href.startswith('/') and not href.startswith('//') and '/.' not in href:
+            return self._origin + href
+        
+        return urljoin(self.base_url, href)
+    
+    def _extract_companies_from_page(
+        self,
+        soup: BeautifulSoup,
+        segment_tag: str
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Извлечение данных компаний со страницы рейтинга (без загрузки детальных страниц)
         
         Args:
             soup: BeautifulSoup объект страницы
             segment_tag: Тег сегмента компании
             
         Returns:
-            Список компаний
+            Список компаний и компании, которые нужно обогатить с детальной страницы
         """
         companies = []
+        to_enrich = []
         
         try:
             # Ищем различные варианты структуры страницы
             # Вариант 1: Компании в блоках с логотипами
-            company_blocks = soup.find_all(['div', 'article'], class_=re.compile(r'company|item|card'))
+            company_blocks = soup.find_all(['div', 'article'], class_=_COMPANY_BLOCK_RE)
             
             if not company_blocks:
                 # Вариант 2: Ищем ссылки на компании
-                company_links = soup.find_all('a', href=re.compile(r'/info/'))
+                company_links = soup.find_all('a', href=_INFO_LINK_RE)
                 
+                # Повторяющиеся на странице ссылки дают одну компанию
+                seen_urls = set()
                 for link in company_links:
                     company_data = self._extract_company_from_link(link, segment_tag)
-                    if company_data:
-                        companies.append(company_data)
+                    if not company_data:
+                        continue
+                    
+                    detail_url = company_data['rating_ref']
+                    if detail_url:
+                        if detail_url in seen_urls:
+                            continue
+                        seen_urls.add(detail_url)
+                    companies.append(company_data)
+                
+                # Компании из ссылок дополняются с детальных страниц
+                to_enrich = [company for company in companies if company['rating_ref']]
             
             else:
                 # Обрабатываем блоки компаний
@@ -151,7 +373,7 @@ class RRARScraper:
         except Exception as e:
             self.logger.error(f"Ошибка извлечения компаний: {e}")
         
-        return companies
+        return companies, to_enrich
     
     def _extract_company_from_link(self, link_element, segment_tag: str) -> Optional[Dict[str, Any]]:
         """
@@ -172,7 +394,7 @@ class RRARScraper:
             # Получаем ссылку на детальную страницу
             detail_url = link_element.get('href')
             if detail_url:
-                detail_url = urljoin(self.base_url, detail_url)
+                detail_url = self._absolute_url(detail_url)
             
             company_data = {
                 'name': normalize_company_name(name),
@@ -185,16 +407,14 @@ class RRARScraper:
                 'region': ''
             }
             
-            # Пытаемся получить дополнительную информацию
-            if detail_url:
-                self._enrich_company_data(company_data, detail_url)
-            
+            # Дополнительная информация с детальной страницы (rating_ref)
+            # загружается отдельно, параллельно для всех ссылок страницы
             return company_data
             
         except Exception as e:
             self.logger.error(f"Ошибка извлечения компании из ссылки: {e}")
             return None
-          def _extract_company_from_block(self, block_element, segment_tag: str) -> Optional[Dict[str, Any]]:
+    def _extract_company_from_block(self, block_element, segment_tag: str) -> Optional[Dict[str, Any]]:
         """
         Извлечение данных компании из блока
         
@@ -207,7 +427,7 @@ class RRARScraper:
         """
         try:
             # Ищем название компании
-            name_element = block_element.find(['h2', 'h3', 'h4', 'a'])
+            name_element = _NAME_SEL.select_one(block_element)
             if not name_element:
                 return None
             
@@ -217,15 +437,19 @@ class RRARScraper:
             
             # Ищем описание
             description = ''
-            desc_element = block_element.find('p') or block_element.find(['div'], class_=re.compile(r'desc|content|text'))
+            # Один проход по блоку; абзац <p> приоритетнее блока с описанием
+            desc_candidates = _DESC_SEL.select(block_element)
+            desc_element = next((elem for elem in desc_candidates if elem.name == 'p'), None)
+            if desc_element is None and desc_candidates:
+                desc_element = desc_candidates[0]
             if desc_element:
                 description = clean_text(desc_element.get_text())
             
             # Ищем ссылку на детальную страницу
-            detail_link = block_element.find('a', href=True)
+            detail_link = _LINK_SEL.select_one(block_element)
             detail_url = ''
             if detail_link:
-                detail_url = urljoin(self.base_url, detail_link['href'])
+                detail_url = self._absolute_url(detail_link['href'])
             
             company_data = {
                 'name': normalize_company_name(name),
@@ -244,51 +468,113 @@ class RRARScraper:
             self.logger.error(f"Ошибка извлечения компании из блока: {e}")
             return None
     
-    def _enrich_company_data(self, company_data: Dict[str, Any], detail_url: str) -> None:
+    async def _enrich_company_data_async(
+        self,
+        session: aiohttp.ClientSession,
+        company_data: Dict[str, Any],
+        detail_url: str
+    ) -> None:
         """
         Обогащение данных компании с детальной страницы
         
         Args:
+            session: HTTP-сессия aiohttp
             company_data: Данные компании для обогащения
             detail_url: URL детальной страницы
         """
+        details = await self._get_details_async(session, detail_url)
+        
+        if details.get('description') and not company_data['description']:
+            company_data['description'] = details['description']
+        if details.get('contacts'):
+            company_data['contacts'] = details['contacts']
+        if details.get('site'):
+            company_data['site'] = details['site']
+    
+    async def _get_details_async(self, session: aiohttp.ClientSession, detail_url: str) -> Dict[str, str]:
+        """
+        Данные детальной страницы через кэш; параллельные запросы одного URL объединяются
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            detail_url: URL детальной страницы
+            
+        Returns:
+            Найденные поля (description, contacts, site)
+        """
+        key = urldefrag(detail_url)[0]
+        
+        details = self._enrich_cache.get(key)
+        if details is not None:
+            return details
+        
+        inflight = self._enrich_inflight.get(key)
+        if inflight is not None:
+            return await inflight
+        
+        future = asyncio.get_running_loop().create_future()
+        self._enrich_inflight[key] = future
+        
+        details = {}
         try:
-            response = safe_request(detail_url, delay=2)
-            if not response:
-                return
+            details = await self._fetch_details_async(session, detail_url)
+            self._enrich_cache[key] = details
+        finally:
+            del self._enrich_inflight[key]
+            future.set_result(details)
+        
+        return details
+    
+    async def _fetch_details_async(self, session: aiohttp.ClientSession, detail_url: str) -> Dict[str, str]:
+        """
+        Загрузка и разбор детальной страницы компании
+        
+        Args:
+            session: HTTP-сессия aiohttp
+            detail_url: URL детальной страницы
+            
+        Returns:
+            Найденные поля (description, contacts, site)
+        """
+        details = {}
+        
+        try:
+            async with _DETAIL_LIMITER:
+                html = await self._fetch_html_async(session, detail_url)
+            if not html:
+                return details
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # Детальная страница разбирается напрямую lxml, без обертки BeautifulSoup:
+            # нужны только первые абзацы и ссылка на сайт. Кодировку определяем так же, как bs4
+            encoding = UnicodeDammit(html, is_html=True).original_encoding
+            tree = lxml.html.fromstring(html, parser=lxml.html.HTMLParser(encoding=encoding))
             
             # Ищем дополнительную информацию
             # Описание
-            desc_elements = soup.find_all(['p'], limit=3)
-            if desc_elements and not company_data['description']:
-                full_desc = ' '.join([clean_text(elem.get_text()) for elem in desc_elements])
-                company_data['description'] = full_desc[:200]
+            desc_elements = list(islice(tree.iter('p'), 3))
+            if desc_elements:
+                full_desc = ' '.join([clean_text(elem.text_content()) for elem in desc_elements])
+                details['description'] = full_desc[:200]
             
-            # Контакты (телефон, email)
-            contact_text = soup.get_text()
-            
-            # Извлекаем телефон
-            phone_match = re.search(r'\+7[\s\-\(\)]?\d{3}[\s\-\(\)]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}', contact_text)
+            # Контакты (телефон, email): поиск по сырому HTML, декодируется только найденное
+            phone_match = _PHONE_RE.search(html)
             if phone_match:
-                company_data['contacts'] = phone_match.group()
-            
-            # Извлекаем email
-            email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', contact_text)
-            if email_match and not company_data['contacts']:
-                company_data['contacts'] = email_match.group()
-              # Сайт
-            site_links = soup.find_all('a', href=re.compile(r'^https?://'))
-            for link in site_links:
-                href = link.get('href', '')
-                domain = urlparse(href).netloc
-                if domain and 'alladvertising' not in domain:
-                    company_data['site'] = href
-                    break
+                details['contacts'] = _decode_phone(phone_match.group())
+            else:
+                # Извлекаем email
+                email_match = _EMAIL_RE.search(html)
+                if email_match:
+                    details['contacts'] = email_match.group().decode('ascii')
+            
+            # Сайт: обход дерева останавливается на первой подходящей внешней ссылке
+            site = next((href for href in (link.get('href') for link in tree.iter('a')) if _is_external_site(href)), None)
+            if site:
+                details['site'] = site
             
         except Exception as e:
             self.logger.error(f"Ошибка обогащения данных компании {detail_url}: {e}")
+        
+        return details
     
     def scrape_all(self) -> List[Dict[str, Any]]:
         """
@@ -297,25 +583,22 @@ class RRARScraper:
         Returns:
             Список всех компаний
         """
-        all_companies = []
+        return self._run(self.scrape_all_async)
+    
+    async def scrape_all_async(self, session: aiohttp.ClientSession) -> List[Dict[str, Any]]:
+        """
+        Асинхронный парсинг всех категорий РРАР: категории загружаются параллельно
         
+        Args:
+            session: HTTP-сессия aiohttp
+            
+        Returns:
+            Список всех компаний (в порядке: BTL, сувенирная продукция, ивент, ТОП-100)
+        """
         self.logger.info("Начинаем парсинг всех категорий РРАР")
         
-        # BTL агентства
-        btl_companies = self.scrape_btl_agencies()
-        all_companies.extend(btl_companies)
-        
-        # Сувенирная продукция  
-        souvenir_companies = self.scrape_souvenir_companies()
-        all_companies.extend(souvenir_companies)
-        
-        # Ивент-агентства
-        event_companies = self.scrape_event_agencies()
-        all_companies.extend(event_companies)
-        
-        # ТОП-100 (полный цикл)
-        top100_companies = self.scrape_top100_agencies()
-        all_companies.extend(top100_companies)
+        results = await asyncio.gather(*(self.scrape_category_async(session, category) for category in _CATEGORIES))
+        all_companies = [company for companies in results for company in companies]
         
         self.logger.info(f"Всего получено компаний из РРАР: {len(all_companies)}")
         
@@ -330,8 +613,7 @@ class RRARScraper:
             filename: Имя файла для сохранения
         """
         try:
-            with open(f"data/raw/{filename}", 'w', encoding='utf-8') as f:
-                json.dump(companies, f, ensure_ascii=False, indent=2)
+            write_json(companies, f"data/raw/{filename}")
             
             self.logger.info(f"Сырые данные РРАР сохранены в {filename}")
             